@@ -0,0 +1,123 @@
+#GregChess archive
+#Stores finished games in an append-only file and reads them back by id.
+
+""" An archive is two files next to each other:
+
+  <name>.dat - the games, one record after another. Each record is
+                 bytes 0-35   the starting position, packed by pack_position
+                 byte 36      the status, an index into archive_statuses
+                 byte 37      the winner: 0 for none, 1 for white, 2 for black
+                 bytes 38-39  the number of moves, little-endian
+                 then the moves, two bytes each, little-endian, as encoded by encode_move
+  <name>.idx - one 12 byte entry per game: the offset of its record in the .dat file (8 bytes)
+               and the record's length (4 bytes), little-endian. Game ids are positions in the index.
+
+Games are only ever added to the end of both files, so records never move. Reading a game maps
+the .dat file with mmap and slices out its record, so nothing else in the file is parsed.
+
+Usage:
+with GameArchive("games") as archive:
+    game_id = archive.append(game)
+    game = archive.read(game_id)
+"""
+
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from GregChess import Game, WHITE, BLACK, PLAYING, CHECKMATE, STALEMATE, REPETITION, FIFTY_MOVES, \
+    RESIGNED, unpack_position, record_move
+
+archive_statuses = [PLAYING, CHECKMATE, STALEMATE, REPETITION, FIFTY_MOVES, RESIGNED]
+archive_winners = [None, WHITE, BLACK]
+record_header = struct.Struct("<36sBBH")
+index_entry = struct.Struct("<QI")
+
+#Turns an array("H") of moves into little-endian bytes and back, whatever the machine's byte order
+def moves_to_bytes(moves):
+    if sys.byteorder == "big":
+        moves = array("H", moves)
+        moves.byteswap()
+    return moves.tobytes()
+
+def moves_from_bytes(data):
+    moves = array("H")
+    moves.frombytes(data)
+    if sys.byteorder == "big":
+        moves.byteswap()
+    return moves
+
+class GameArchive(object):
+
+    def __init__(self, name):
+        self.data = open(name + ".dat", "a+b")
+        self.index = open(name + ".idx", "a+b")
+        self.count = os.fstat(self.index.fileno()).st_size // index_entry.size
+        self.view = None
+        self.view_size = 0
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.view is not None:
+            self.view.close()
+            self.view = None
+        self.data.close()
+        self.index.close()
+
+    #Adds a game to the end of the archive and returns its id
+    def append(self, game):
+        if len(game.moves) > 0xffff:
+            raise ValueError("too many moves to archive: %d" % len(game.moves))
+        record = record_header.pack(game.start, archive_statuses.index(game.status),
+                                    archive_winners.index(game.winner), len(game.moves))
+        record += moves_to_bytes(game.moves)
+        self.data.seek(0, os.SEEK_END)
+        offset = self.data.tell()
+        self.data.write(record)
+        self.data.flush()
+        #The index entry is written after the record, so a game is never indexed before it is all on disk
+        self.index.seek(0, os.SEEK_END)
+        self.index.write(index_entry.pack(offset, len(record)))
+        self.index.flush()
+        self.count += 1
+        return self.count - 1
+
+    #Returns the raw record of a game, mapping the data file again if it has grown since last time
+    def record(self, game_id):
+        if not 0 <= game_id < self.count:
+            raise IndexError("no game %d in archive of %d games" % (game_id, self.count))
+        self.index.seek(game_id * index_entry.size)
+        offset, length = index_entry.unpack(self.index.read(index_entry.size))
+        if offset + length > self.view_size:
+            if self.view is not None:
+                self.view.close()
+            self.view_size = os.fstat(self.data.fileno()).st_size
+            self.view = mmap.mmap(self.data.fileno(), self.view_size, access=mmap.ACCESS_READ)
+        return self.view[offset:offset+length]
+
+    #Returns a game's starting position (packed), status, winner and moves without replaying it
+    def read_moves(self, game_id):
+        record = self.record(game_id)
+        start, status, winner, count = record_header.unpack_from(record)
+        moves = moves_from_bytes(record[record_header.size:record_header.size + count*2])
+        return start, archive_statuses[status], archive_winners[winner], moves
+
+    #Returns a game rebuilt from the archive by replaying its moves from its starting position
+    def read(self, game_id):
+        start, status, winner, moves = self.read_moves(game_id)
+        game = Game(unpack_position(start))
+        for move in moves:
+            record_move(game, move)
+        game.status = status
+        game.winner = winner
+        return game
@@ -0,0 +1,401 @@
+#GregChess book
+#Opening book and endgame tables, kept in sorted binary files and searched through mmap.
+
+""" Both files are a run of fixed-size records sorted by a 64-bit Zobrist key, with nothing else
+in them. Opening them maps the file into memory; a lookup is a binary search over the records in
+place, so nothing is read or parsed ahead of time.
+
+  book.bin      records of (key, move, games): a move played from the position and how many of
+                the games it was built from played it. A position has one record per move.
+  endgames.bin  records of (key, result, plies): every king and queen, king and rook and king and
+                pawn against king position that is won (WIN) or lost (LOSS) for the player to move,
+                and how many plies the mate takes with best play, plus the stalemates (DRAW, 0).
+                Any other position with that material is a draw. Only positions where white has the
+                extra piece are stored; the others are looked up with the board flipped.
+
+The endgame table is worked out by retrograde analysis: starting from the mates, a position where
+white can move into a position lost for black is won in one ply more, and a position where every
+black move leads to a win for white is lost, level by level so that each position gets its
+shortest mate. King and pawn positions use the queen and rook tables for promotions.
+
+Usage:
+python GregBook.py --build-book [games.pgn] [--plies 16]    Build book.bin from PGN games, or from
+                                                              the opening lines below
+python GregBook.py --build-endgames                         Build endgames.bin (takes under a minute)
+python GregBook.py --probe "<FEN>"                          Show what the book and table say
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import time
+
+from GregChess import EMPTY, WHITE, BLACK, Game, from_fen, make_move, unmake_move, generate_legal_moves, \
+    san_to_move, move_text, king_attacks, slider_rays, slider_lines, between, pawn_attacks, \
+    zobrist_pieces, zobrist_castling, zobrist_black
+from GregReplay import read_pgn
+
+#Results in the endgame table, for the player to move
+WIN, LOSS, DRAW = 1, 2, 3
+result_names = {WIN: "win", LOSS: "loss", DRAW: "draw"}
+
+key_record = struct.Struct("<Q")
+book_record = struct.Struct("<QHH")         #Zobrist key, move, games
+endgame_record = struct.Struct("<QBB")      #Zobrist key, result, plies
+
+book_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+endgame_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgames.bin")
+
+#Main lines of common openings, used to build a book when no games are given
+opening_lines = [
+    "e4 e5 Nf3 Nc6 Bb5 a6 Ba4 Nf6 O-O Be7 Re1 b5 Bb3 d6 c3 O-O",      #Ruy Lopez
+    "e4 e5 Nf3 Nc6 Bc4 Bc5 c3 Nf6 d4 exd4 cxd4 Bb4+",                  #Italian
+    "e4 e5 Nf3 Nc6 d4 exd4 Nxd4 Nf6 Nxc6 bxc6",                        #Scotch
+    "e4 e5 Nf3 Nf6 Nxe5 d6 Nf3 Nxe4 d4 d5",                            #Petrov
+    "e4 c5 Nf3 d6 d4 cxd4 Nxd4 Nf6 Nc3 a6",                            #Sicilian Najdorf
+    "e4 c5 Nf3 Nc6 d4 cxd4 Nxd4 Nf6 Nc3 e5",                           #Sicilian Sveshnikov
+    "e4 c5 Nc3 Nc6 g3 g6 Bg2 Bg7 d3 d6",                               #Closed Sicilian
+    "e4 e6 d4 d5 Nc3 Nf6 Bg5 Be7 e5 Nfd7",                             #French
+    "e4 e6 d4 d5 Nd2 c5 exd5 exd5",                                    #French Tarrasch
+    "e4 c6 d4 d5 Nc3 dxe4 Nxe4 Bf5 Ng3 Bg6",                           #Caro-Kann
+    "e4 d5 exd5 Qxd5 Nc3 Qa5 d4 Nf6",                                  #Scandinavian
+    "d4 d5 c4 e6 Nc3 Nf6 Bg5 Be7 e3 O-O Nf3 h6",                       #Queen's Gambit Declined
+    "d4 d5 c4 c6 Nf3 Nf6 Nc3 dxc4 a4 Bf5",                             #Slav
+    "d4 d5 c4 dxc4 Nf3 Nf6 e3 e6 Bxc4 c5",                             #Queen's Gambit Accepted
+    "d4 Nf6 c4 g6 Nc3 Bg7 e4 d6 Nf3 O-O Be2 e5",                       #King's Indian
+    "d4 Nf6 c4 e6 Nc3 Bb4 e3 O-O Bd3 d5",                              #Nimzo-Indian
+    "d4 Nf6 c4 e6 Nf3 b6 g3 Bb7 Bg2 Be7",                              #Queen's Indian
+    "d4 Nf6 c4 g6 Nc3 d5 cxd5 Nxd5 e4 Nxc3 bxc3 Bg7",                  #Grunfeld
+    "d4 f5 g3 Nf6 Bg2 g6 Nf3 Bg7",                                     #Dutch
+    "c4 e5 Nc3 Nf6 Nf3 Nc6 g3 d5 cxd5 Nxd5",                           #English
+    "Nf3 d5 g3 Nf6 Bg2 e6 O-O Be7 d3 O-O",                             #Reti
+]
+
+#A file of fixed-size records sorted by the 64-bit key at the start of each record, mapped into
+#memory and searched in place.
+class SortedTable(object):
+    __slots__ = ("file", "view", "record", "count")
+
+    def __init__(self, path, record):
+        self.record = record
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.count = size // record.size
+        self.view = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def close(self):
+        if self.count:
+            self.view.close()
+        self.file.close()
+
+    #Returns every record with the given key
+    def find(self, key):
+        view = self.view
+        size = self.record.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if key_record.unpack_from(view, middle*size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        records = []
+        while low < self.count:
+            record = self.record.unpack_from(view, low*size)
+            if record[0] != key:
+                break
+            records.append(record)
+            low += 1
+        return records
+
+#Writes records (tuples starting with the key) to path sorted by key, in the format SortedTable reads
+def write_table(path, record, records):
+    with open(path, "wb") as f:
+        for r in sorted(records):
+            f.write(record.pack(*r))
+
+#Counts how often each move was played from each position in the first plies of the games,
+#given as lists of moves in standard algebraic notation. Returns book records.
+def book_records(games, plies=16):
+    counts = {}
+    for moves in games:
+        position = Game().position
+        for san in moves[:plies]:
+            move = san_to_move(position, san)
+            if move is None:
+                break
+            counts[(position.key, move)] = counts.get((position.key, move), 0) + 1
+            make_move(position, move)
+    return [(key, move, min(count, 0xffff)) for (key, move), count in counts.items()]
+
+class OpeningBook(object):
+    __slots__ = ("table",)
+
+    def __init__(self, path=book_file):
+        self.table = SortedTable(path, book_record)
+
+    #Returns the legal book moves for a position as (move, games) pairs, most played first
+    def moves(self, position):
+        records = self.table.find(position.key)
+        if not records:
+            return []
+        legal = generate_legal_moves(position, position.turn)
+        return sorted([(move, games) for key, move, games in records if move in legal], key=lambda m: -m[1])
+
+    #Picks a book move at random, weighted by how often it was played, or None out of book
+    def choose(self, position, rng=random):
+        moves = self.moves(position)
+        if not moves:
+            return None
+        return rng.choices([m for m, games in moves], [games for m, games in moves])[0]
+
+#The key of a king and one piece against king position as stored in the endgame table
+def table_key(white_king, black_king, piece, square, black_to_move):
+    key = zobrist_castling[0] ^ zobrist_pieces["G"][white_king] ^ zobrist_pieces["g"][black_king] ^ \
+          zobrist_pieces[piece][square]
+    return key ^ zobrist_black if black_to_move else key
+
+#The table key of a position, with the colors swapped and the board flipped when black has the
+#extra piece. Returns None for positions with any other material, and for positions where a side
+#can still castle, which the table was solved without.
+def endgame_key(position):
+    squares = position.squares
+    if squares.count(EMPTY) != 61 or position.castling:
+        return None
+    square = next(s for s, piece in enumerate(squares) if piece != EMPTY and piece not in "Gg")
+    piece = squares[square]
+    if piece not in "QRPqrp":
+        return None
+    white_king, black_king = position.kings[WHITE], position.kings[BLACK]
+    if piece.isupper():
+        return table_key(white_king, black_king, piece, square, position.turn == BLACK)
+    #Square ^ 56 flips the board top to bottom
+    return table_key(black_king ^ 56, white_king ^ 56, piece.upper(), square ^ 56, position.turn == WHITE)
+
+class EndgameTable(object):
+    __slots__ = ("table",)
+
+    def __init__(self, path=endgame_file):
+        self.table = SortedTable(path, endgame_record)
+
+    #Returns (result, plies) for the player to move, or None if the table doesn't cover the position.
+    #plies is how long the mate takes (0 when already mated); for a draw it is 0 when stalemated,
+    #otherwise None.
+    def probe(self, position):
+        key = endgame_key(position)
+        if key is None:
+            return None
+        records = self.table.find(key)
+        if not records:
+            return DRAW, None
+        return records[0][1], records[0][2]
+
+    #The move keeping the best result: the quickest mate when winning, the slowest when losing and
+    #any move keeping the draw when drawn. Returns None if the table doesn't cover the position.
+    def best_move(self, position):
+        if self.probe(position) is None:
+            return None
+        best = None
+        best_score = None
+        for m in generate_legal_moves(position, position.turn):
+            make_move(position, m)
+            child = self.probe(position)
+            unmake_move(position)
+            #The result after the move is for the opponent. Leaving the table (a capture or a minor
+            #piece promotion) leaves a draw.
+            score = 0
+            if child is not None and child[0] == LOSS:
+                score = 1000 - child[1]
+            elif child is not None and child[0] == WIN:
+                score = -1000 + child[1]
+            if best_score is None or score > best_score:
+                best, best_score = m, score
+        return best
+
+#Opens the book or endgame table at path, or returns None if it hasn't been built
+def open_book(path=book_file):
+    return OpeningBook(path) if os.path.exists(path) else None
+
+def open_endgame_table(path=endgame_file):
+    return EndgameTable(path) if os.path.exists(path) else None
+
+#Index of a king and piece against king position in the arrays solve_endgame works on
+def position_index(white_king, black_king, square, black_to_move):
+    return ((white_king << 6 | black_king) << 6 | square) << 1 | black_to_move
+
+POSITIONS = 1 << 19
+
+#Whether a white queen, rook or pawn on square attacks target, with the white king on blocker
+def piece_attacks(piece, square, target, blocker):
+    if piece == "P":
+        return target in pawn_attacks[WHITE][square]
+    return target in slider_lines[piece][square] and blocker not in between[square][target]
+
+#Number of legal moves for the black king
+def black_move_count(piece, white_king, black_king, square):
+    count = 0
+    for s in king_attacks[black_king]:
+        if s in king_attacks[white_king]:
+            continue
+        if s == square:
+            if square not in king_attacks[white_king]:    #Capturing an undefended piece
+                count += 1
+        elif not piece_attacks(piece, square, s, white_king):
+            count += 1
+    return count
+
+#Whether white has any legal move
+def white_can_move(piece, white_king, black_king, square):
+    for s in king_attacks[white_king]:
+        if s != square and s != black_king and s not in king_attacks[black_king]:
+            return True
+    if piece == "P":
+        return square-8 not in (white_king, black_king)
+    return True
+
+#The white to move positions that lead to a black to move position by one white move
+def white_unmoves(piece, white_king, black_king, square):
+    previous = []
+    for s in king_attacks[white_king]:
+        if s != black_king and s != square and s not in king_attacks[black_king] and \
+           not piece_attacks(piece, square, black_king, s):
+            previous.append(position_index(s, black_king, square, 0))
+    starts = []
+    if piece == "P":
+        if square+8 < 56 and square+8 not in (white_king, black_king):
+            starts.append(square+8)
+            if 32 <= square < 40 and square+16 not in (white_king, black_king):
+                starts.append(square+16)
+    else:
+        for direction in slider_rays[piece][square]:
+            for s in direction:
+                if s == white_king or s == black_king:
+                    break
+                starts.append(s)
+    for s in starts:
+        if not piece_attacks(piece, s, black_king, white_king):
+            previous.append(position_index(white_king, black_king, s, 0))
+    return previous
+
+#The black to move positions that lead to a white to move position by one black king move
+def black_unmoves(white_king, black_king, square):
+    return [position_index(white_king, s, square, 1) for s in king_attacks[black_king]
+            if s != square and s != white_king and s not in king_attacks[white_king]]
+
+#Works out the king and piece ("Q", "R" or "P") against king positions by retrograde analysis.
+#promoted maps "Q" and "R" to their solved tables, needed for "P".
+#Returns (results, plies), two arrays indexed by position_index.
+def solve_endgame(piece, promoted=None):
+    results = bytearray(POSITIONS)
+    plies = bytearray(POSITIONS)
+    moves_left = bytearray(POSITIONS)
+    levels = [[] for level in range(256)]
+    squares = range(8, 56) if piece == "P" else range(64)
+    for white_king in range(64):
+        for black_king in range(64):
+            if black_king == white_king or black_king in king_attacks[white_king]:
+                continue
+            for square in squares:
+                if square == white_king or square == black_king:
+                    continue
+                index = position_index(white_king, black_king, square, 1)
+                check = piece_attacks(piece, square, black_king, white_king)
+                moves_left[index] = black_move_count(piece, white_king, black_king, square)
+                if moves_left[index] == 0:
+                    results[index] = LOSS if check else DRAW
+                    if check:
+                        levels[0].append(index)
+                if check:
+                    continue    #White can't be to move with black in check
+                index ^= 1
+                if not white_can_move(piece, white_king, black_king, square):
+                    results[index] = DRAW
+                elif piece == "P" and square < 16 and square-8 not in (white_king, black_king):
+                    #Promotions lead into the queen and rook tables
+                    for promoted_results, promoted_plies in promoted.values():
+                        after = position_index(white_king, black_king, square-8, 1)
+                        if promoted_results[after] == LOSS:
+                            levels[promoted_plies[after]+1].append(index)
+
+    for level in range(255):
+        for index in levels[level]:
+            white_king, black_king, square = index >> 13, index >> 7 & 63, index >> 1 & 63
+            if index & 1:
+                #Lost for black: white wins from every position that can move here
+                for previous in white_unmoves(piece, white_king, black_king, square):
+                    if results[previous] == 0:
+                        levels[level+1].append(previous)
+            elif results[index] == 0:
+                results[index] = WIN
+                plies[index] = level
+                for previous in black_unmoves(white_king, black_king, square):
+                    moves_left[previous] -= 1
+                    if moves_left[previous] == 0:
+                        results[previous] = LOSS
+                        plies[previous] = level+1
+                        levels[level+1].append(previous)
+    return results, plies
+
+#Builds the endgame table records for king and queen, king and rook and king and pawn against king
+def endgame_records(info=None):
+    records = []
+    solved = {}
+    for piece in "QRP":
+        start = time.perf_counter()
+        results, plies = solved[piece] = solve_endgame(piece, solved)
+        before = len(records)
+        for index in range(POSITIONS):
+            if results[index]:
+                records.append((table_key(index >> 13, index >> 7 & 63, piece, index >> 1 & 63, index & 1),
+                                results[index], plies[index]))
+        if info is not None:
+            info("K{}K: {} positions in {:.1f}s, longest mate {} plies".format(
+                piece, len(records) - before, time.perf_counter() - start, max(plies)))
+    return records
+
+def probe(fen, book, endgames):
+    position = from_fen(fen)
+    if book is not None:
+        moves = book.moves(position)
+        print("Book: " + (", ".join("{} ({})".format(move_text(m), games) for m, games in moves) or "no moves"))
+    if endgames is not None:
+        hit = endgames.probe(position)
+        if hit is None:
+            print("Endgame table: not covered")
+        else:
+            print("Endgame table: {}{}".format(result_names[hit[0]],
+                                               " in {} plies".format(hit[1]) if hit[1] is not None else ""))
+            move = endgames.best_move(position)
+            if move is not None:
+                print("Best move: " + move_text(move))
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the GregChess opening book and endgame table")
+    parser.add_argument("--build-book", nargs="?", const="", metavar="PGN",
+                        help="build the book from a PGN file, or from the built in opening lines")
+    parser.add_argument("--plies", type=int, default=16, help="plies of each game to put in the book")
+    parser.add_argument("--build-endgames", action="store_true", help="build the endgame table")
+    parser.add_argument("--probe", metavar="FEN", help="look a position up")
+    parser.add_argument("--book", default=book_file)
+    parser.add_argument("--endgames", default=endgame_file)
+    args = parser.parse_args()
+
+    if args.build_book is not None:
+        if args.build_book:
+            with open(args.build_book) as f:
+                records = book_records((moves for number, tags, moves in read_pgn(f)), args.plies)
+        else:
+            records = book_records((line.split() for line in opening_lines), args.plies)
+        write_table(args.book, book_record, records)
+        print("Wrote {} book moves to {}".format(len(records), args.book))
+    if args.build_endgames:
+        records = endgame_records(info=print)
+        write_table(args.endgames, endgame_record, records)
+        print("Wrote {} positions to {}".format(len(records), args.endgames))
+    if args.probe:
+        probe(args.probe, open_book(args.book), open_endgame_table(args.endgames))
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,13 @@ For example, as the White(capital letters) player, if you have a pawn at a2 and
 you want to move it up to a3, you would type "Pa2 a3."
 """
 
+import argparse
 import copy
+import os
+import random
+import time
+from array import array
+from collections import OrderedDict
 
 #Create an 8x8 2D array with space representing white squares and X's representing black squares.
 base_board_row = [" " if space%2==0 else "X" for space in range(8)]
@@ -35,11 +41,262 @@ starting_piece_positions = [''.join(p) for p in list(zip("rkbqgbkr","abcdefgh","
 
 
 
-#Create variables for tracking piece positions and the board as the game progresses
-current_piece_positions = copy.deepcopy(starting_piece_positions)
-active_board = copy.deepcopy(base_board)
-captured_pieces = {"White(capitals)": [], "Black(lowercase)": []}  #Tracks captured pieces
-move_list = []             #Tracks all moves made during the game.
+#Squares are numbered 0-63 in the same order as the board array: a8=0, b8=1 ... h1=63.
+#Square index = row*8 + column, so piece_coords() and the square index describe the same space.
+square_indexes = {a+b: row_indexes[b]*8+column_indexes[a] for a in column_indexes for b in row_indexes}
+square_names = sorted(square_indexes, key=square_indexes.get)
+base_board_squares = [space for row in base_board for space in row]
+
+EMPTY = " "  #Marks an empty square in a Position
+WHITE = "White(capitals)"
+BLACK = "Black(lowercase)"
+
+#Castling rights are kept as bit flags so they can be stored and restored as a single number
+WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE = 1, 2, 4, 8
+
+#Moves are stored as a single integer: bits 0-5 hold the starting square, bits 6-11 the destination
+#square and bits 12-15 a flag describing special moves.
+QUIET, DOUBLE_PUSH, CASTLE, EN_PASSANT, PROMOTE_KNIGHT, PROMOTE_BISHOP, PROMOTE_ROOK, PROMOTE_QUEEN = range(8)
+promotion_pieces = {PROMOTE_KNIGHT: "K", PROMOTE_BISHOP: "B", PROMOTE_ROOK: "R", PROMOTE_QUEEN: "Q"}
+
+def encode_move(start, destination, flag=QUIET):
+    return start | destination << 6 | flag << 12
+
+def move_start(move):
+    return move & 63
+
+def move_destination(move):
+    return (move >> 6) & 63
+
+def move_flag(move):
+    return move >> 12
+
+knight_steps = [(-2,-1),(-2,1),(-1,-2),(-1,2),(1,-2),(1,2),(2,-1),(2,1)]
+king_steps = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
+rook_directions = [(-1,0),(1,0),(0,-1),(0,1)]
+bishop_directions = [(-1,-1),(-1,1),(1,-1),(1,1)]
+
+#Returns the squares reached by taking each of the (row, column) steps once from a square
+def step_targets(square, steps):
+    row, column = divmod(square, 8)
+    return [(row+r)*8+column+c for r, c in steps if 0 <= row+r < 8 and 0 <= column+c < 8]
+
+#Returns the squares along a direction from a square, nearest first, up to the edge of the board
+def ray(square, direction):
+    row, column = divmod(square, 8)
+    squares = []
+    row, column = row+direction[0], column+direction[1]
+    while 0 <= row < 8 and 0 <= column < 8:
+        squares.append(row*8+column)
+        row, column = row+direction[0], column+direction[1]
+    return squares
+
+#Move tables, built once when the module is loaded so move checking and generation never have to
+#work out board geometry. Each table is indexed by square.
+knight_attacks = [step_targets(square, knight_steps) for square in range(64)]
+king_attacks = [step_targets(square, king_steps) for square in range(64)]
+
+#Rays list the squares in each direction nearest first, so a scan can stop at the first piece.
+rook_rays = [[ray(square, d) for d in rook_directions] for square in range(64)]
+bishop_rays = [[ray(square, d) for d in bishop_directions] for square in range(64)]
+queen_rays = [rook_rays[square]+bishop_rays[square] for square in range(64)]
+slider_rays = {"R": rook_rays, "B": bishop_rays, "Q": queen_rays}
+slider_lines = {kind: [set(s for direction in rays[square] for s in direction) for square in range(64)]
+                for kind, rays in slider_rays.items()}
+
+#between[start][end] lists the squares strictly between two squares on the same row, column or
+#diagonal, and is None for squares that don't share a line.
+def squares_between(start, end):
+    for direction in queen_rays[start]:
+        if end in direction:
+            return direction[:direction.index(end)]
+    return None
+between = [[squares_between(start, end) for end in range(64)] for start in range(64)]
+
+#pawn_attacks[color][square] holds the squares a pawn of that color on the square attacks,
+#pawn_pushes the square in front of it and pawn_double_pushes the square two ahead (only from its starting row).
+pawn_attacks = {WHITE: [step_targets(square, [(-1,-1),(-1,1)]) for square in range(64)],
+                BLACK: [step_targets(square, [(1,-1),(1,1)]) for square in range(64)]}
+pawn_pushes = {WHITE: [square-8 if square >= 8 else None for square in range(64)],
+               BLACK: [square+8 if square < 56 else None for square in range(64)]}
+pawn_double_pushes = {WHITE: [square-16 if 48 <= square < 56 else None for square in range(64)],
+                      BLACK: [square+16 if 8 <= square < 16 else None for square in range(64)]}
+promotion_squares = [square < 8 or square >= 56 for square in range(64)]
+
+#castling_masks[square] holds the castling rights that survive a move from or to that square
+castling_masks = [15]*64
+for space, lost in [("e1", WHITE_KINGSIDE | WHITE_QUEENSIDE), ("h1", WHITE_KINGSIDE), ("a1", WHITE_QUEENSIDE),
+                    ("e8", BLACK_KINGSIDE | BLACK_QUEENSIDE), ("h8", BLACK_KINGSIDE), ("a8", BLACK_QUEENSIDE)]:
+    castling_masks[square_indexes[space]] = 15 & ~lost
+
+#For each color: the right, the king's start and destination, the square it passes through
+#and the squares that must be empty between king and rook.
+castling_paths = {}
+for color, rank, kingside, queenside in [(WHITE, "1", WHITE_KINGSIDE, WHITE_QUEENSIDE),
+                                         (BLACK, "8", BLACK_KINGSIDE, BLACK_QUEENSIDE)]:
+    king_square = square_indexes["e"+rank]
+    castling_paths[color] = [(kingside, king_square, king_square+2, king_square+1,
+                              between[king_square][square_indexes["h"+rank]]),
+                             (queenside, king_square, king_square-2, king_square-1,
+                              between[king_square][square_indexes["a"+rank]])]
+
+#Zobrist keys: a fixed random 64-bit number for every piece on every square, every set of castling
+#rights, every en passant square and the side to move. XORing together the numbers for everything in a
+#position gives its key, and a move only has to XOR in and out the few numbers it changes.
+#The generator is seeded so keys are the same every time the game is run.
+zobrist_random = random.Random(2014)
+zobrist_pieces = {piece: [zobrist_random.getrandbits(64) for square in range(64)] for piece in "PKBRQGpkbrqg"}
+zobrist_castling = [zobrist_random.getrandbits(64) for rights in range(16)]
+zobrist_ep = [zobrist_random.getrandbits(64) for square in range(64)]
+zobrist_black = zobrist_random.getrandbits(64)
+
+#Works out the Zobrist key of a position from scratch
+def zobrist_key(position):
+    key = zobrist_castling[position.castling]
+    for square, piece in enumerate(position.squares):
+        if piece != EMPTY:
+            key ^= zobrist_pieces[piece][square]
+    if position.ep_square is not None:
+        key ^= zobrist_ep[position.ep_square]
+    if position.turn == BLACK:
+        key ^= zobrist_black
+    return key
+
+#Compact board used for all move checking. Holds one piece letter (or EMPTY) per square,
+#so looking up what is on a square is a single list index instead of a scan of the piece list.
+#Also tracks the castling rights, the en passant square and the side to move, which can't be read
+#off the board, the square of each king and a history of undo records for the moves made on it.
+#key is the position's Zobrist key, kept up to date by make_move, and repetitions counts how many
+#times each key has come up so far. halfmove_clock counts moves since the last capture or pawn move
+#and fullmove_number counts full moves from the start of the game, as in FEN.
+class Position(object):
+    __slots__ = ("squares", "castling", "ep_square", "turn", "halfmove_clock", "fullmove_number", "kings",
+                 "key", "repetitions", "history")
+
+    def __init__(self, squares=None, castling=0, ep_square=None, turn=WHITE, halfmove_clock=0, fullmove_number=1):
+        if squares is None:
+            squares = [EMPTY]*64
+        self.squares = squares
+        self.castling = castling
+        self.ep_square = ep_square
+        self.turn = turn
+        self.halfmove_clock = halfmove_clock
+        self.fullmove_number = fullmove_number
+        self.kings = {WHITE: None, BLACK: None}
+        for square, piece in enumerate(squares):
+            if piece == "G":
+                self.kings[WHITE] = square
+            elif piece == "g":
+                self.kings[BLACK] = square
+        self.key = zobrist_key(self)
+        self.repetitions = {self.key: 1}
+        self.history = []
+
+    #Builds a position from a list of piece positions in the "Ra1" format.
+    #A side keeps a castling right as long as its king and that rook are on their starting squares.
+    @classmethod
+    def from_piece_positions(cls, piece_positions, turn=WHITE):
+        squares = [EMPTY]*64
+        for piece in piece_positions:
+            squares[square_indexes[piece[1:]]] = piece[0]
+        castling = 0
+        for right, king, rook in [(WHITE_KINGSIDE, "Ge1", "Rh1"), (WHITE_QUEENSIDE, "Ge1", "Ra1"),
+                                  (BLACK_KINGSIDE, "ge8", "rh8"), (BLACK_QUEENSIDE, "ge8", "ra8")]:
+            if king in piece_positions and rook in piece_positions:
+                castling |= right
+        return cls(squares, castling, turn=turn)
+
+    #Returns the pieces on the board as a list in the "Ra1" format
+    def piece_positions(self):
+        return [p+square_names[s] for s, p in enumerate(self.squares) if p != EMPTY]
+
+    def copy(self):
+        position = Position(self.squares[:], self.castling, self.ep_square, self.turn, self.halfmove_clock,
+                            self.fullmove_number)
+        position.repetitions = dict(self.repetitions)
+        position.history = self.history[:]
+        return position
+
+
+#Game states. A game is PLAYING until one of the others is reached.
+PLAYING = "playing"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+REPETITION = "threefold repetition"
+FIFTY_MOVES = "fifty-move rule"
+RESIGNED = "resigned"
+
+#Error codes returned by move_piece and apply_move, and the message the terminal game shows for each
+INVALID_INPUT = "invalid input"
+WRONG_PIECE = "wrong piece"
+INVALID_MOVE = "invalid move"
+OWN_PIECE = "own piece"
+INTO_CHECK = "into check"
+PROMOTION_NEEDED = "promotion needed"
+INVALID_PROMOTION = "invalid promotion"
+GAME_OVER = "game over"
+error_messages = {INVALID_INPUT: "Invalid input!",
+                  WRONG_PIECE: "Invalid piece for {player} player!",
+                  INVALID_MOVE: "Invalid Move",
+                  OWN_PIECE: "Invalid move, can't capture your own piece!",
+                  INTO_CHECK: "Invalid move, can't move into check!",
+                  PROMOTION_NEEDED: "Promote your pawn. Enter the letter of the piece type you wish to use.",
+                  INVALID_PROMOTION: "Invalid piece type. Please select again.",
+                  GAME_OVER: "The game is over."}
+
+#Holds the state of one game: the starting position (packed by pack_position), the current
+#position, the captured pieces, the moves made and whether the game is still being played
+#(status) and who won (winner). Moves are kept as 16 bit encoded moves, two bytes each.
+#Nothing about a game is kept in module globals, so one process can run any number of games.
+class Game(object):
+    __slots__ = ("start", "position", "captured_pieces", "moves", "status", "winner", "endgames")
+
+    #endgames, if given, is an endgame table (a GregBook.EndgameTable) the game's status is looked up in
+    def __init__(self, position=None, endgames=None):
+        if position is None:
+            position = Position.from_piece_positions(starting_piece_positions)
+        self.start = pack_position(position)
+        self.position = position
+        self.endgames = endgames
+        self.captured_pieces = {"White(capitals)": [], "Black(lowercase)": []}  #Tracks captured pieces
+        self.moves = array("H")          #Tracks all moves made during the game.
+        self.status = PLAYING
+        self.winner = None
+        update_status(self)
+
+    #The player whose turn it is
+    @property
+    def player(self):
+        return self.position.turn
+
+    #The moves made as ("Pe2", "e4") pairs of the piece moved and its destination, worked out
+    #by replaying the moves from the starting position
+    @property
+    def move_list(self):
+        position = unpack_position(self.start)
+        move_list = []
+        for m in self.moves:
+            start = move_start(m)
+            move_list.append((position.squares[start] + square_names[start], square_names[move_destination(m)]))
+            make_move(position, m)
+        return move_list
+
+#What happened when a move was tried. error is None when the move was made, otherwise one of
+#the error codes above. captured is the captured piece in the "Ra1" format, check is True when
+#the move put the other player in check and status is the game state after the move.
+class MoveResult(object):
+    __slots__ = ("error", "move", "captured", "check", "status")
+
+    def __init__(self, error=None, move=None, captured=None, check=False, status=PLAYING):
+        self.error = error
+        self.move = move
+        self.captured = captured
+        self.check = check
+        self.status = status
+
+    @property
+    def ok(self):
+        return self.error is None
 
 #Takes a piece/position and returns its index values in the board array
 # Ra1 -> (7,0) : White rook is in row[7], column[0]
@@ -48,17 +305,117 @@ def piece_coords(piece):
 
 #Takes a position on the board and returns the piece at that position, " " or "X" if empty
 def piece_at(position, current_board):
-    position_coords = row_indexes[position[1]],column_indexes[position[0]]
-    return current_board[position_coords[0]][position_coords[1]]
+    square = square_indexes[position]
+    if current_board.squares[square] == EMPTY:
+        return base_board_squares[square]
+    return current_board.squares[square]+position
 
 
 #Takes a lits of piece positions and redraws the board given those positions
 def update_board(piece_positions):
-    new_board = copy.deepcopy(base_board)
-    for piece in piece_positions:
-        x, y = piece_coords(piece)
-        new_board[x][y] = piece
-    return new_board
+    return Position.from_piece_positions(piece_positions)
+
+#FEN notation uses N for knights and K for kings, this game uses K and G
+fen_pieces = {"P": "P", "N": "K", "B": "B", "R": "R", "Q": "Q", "K": "G"}
+fen_pieces.update({k.lower(): v.lower() for k, v in fen_pieces.items()})
+piece_fen = {v: k for k, v in fen_pieces.items()}
+
+#Builds a position from a FEN string, e.g. the starting position is
+#"rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+def from_fen(fen):
+    fields = fen.split()
+    if len(fields) < 4:
+        raise ValueError("Invalid FEN: " + fen)
+    squares = []
+    for row in fields[0].split("/"):
+        for c in row:
+            if c.isdigit():
+                squares += [EMPTY]*int(c)
+            elif c in fen_pieces:
+                squares.append(fen_pieces[c])
+            else:
+                raise ValueError("Invalid FEN: " + fen)
+    if len(squares) != 64 or fields[1] not in ("w", "b") or squares.count("G") != 1 or squares.count("g") != 1:
+        raise ValueError("Invalid FEN: " + fen)
+    #Pawns can't stand on the first or last row, they promote on reaching it
+    if any(squares[s] in "Pp" for s in range(64) if promotion_squares[s]):
+        raise ValueError("Invalid FEN: " + fen)
+    turn = WHITE if fields[1] == "w" else BLACK
+
+    #As in from_piece_positions, a castling right is only kept while the king and that rook are on their
+    #starting squares
+    castling = 0
+    for c, right, king, rook in [("K", WHITE_KINGSIDE, "Ge1", "Rh1"), ("Q", WHITE_QUEENSIDE, "Ge1", "Ra1"),
+                                 ("k", BLACK_KINGSIDE, "ge8", "rh8"), ("q", BLACK_QUEENSIDE, "ge8", "ra8")]:
+        if c in fields[2] and squares[square_indexes[king[1:]]] == king[0] and \
+           squares[square_indexes[rook[1:]]] == rook[0]:
+            castling |= right
+    #As in make_move, the en passant square is only kept if a pawn of the player to move can take on it
+    ep_square = square_indexes.get(fields[3])
+    if ep_square is not None:
+        pawn = "P" if turn == WHITE else "p"
+        if not any(squares[s] == pawn for s in pawn_attacks[opposing_color(turn)][ep_square]):
+            ep_square = None
+    halfmove_clock = int(fields[4]) if len(fields) > 4 else 0
+    fullmove_number = int(fields[5]) if len(fields) > 5 else 1
+    return Position(squares, castling, ep_square, turn, halfmove_clock, fullmove_number)
+
+#Writes a position as a FEN string
+def to_fen(position):
+    rows = []
+    for row in range(8):
+        text = ""
+        empty = 0
+        for piece in position.squares[row*8:row*8+8]:
+            if piece == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                text += str(empty)
+                empty = 0
+            text += piece_fen[piece]
+        if empty:
+            text += str(empty)
+        rows.append(text)
+    castling = "".join(c for c, right in zip("KQkq", (WHITE_KINGSIDE, WHITE_QUEENSIDE, BLACK_KINGSIDE, BLACK_QUEENSIDE))
+                       if position.castling & right)
+    ep_square = square_names[position.ep_square] if position.ep_square is not None else "-"
+    return "{} {} {} {} {} {}".format("/".join(rows), "w" if position.turn == WHITE else "b", castling or "-",
+                                      ep_square, position.halfmove_clock, position.fullmove_number)
+
+#Packed binary positions are 36 bytes:
+#  bytes 0-31  two squares per byte, a8 first, each square a 4 bit code from packed_codes (0 is empty)
+#  byte 32     castling rights in the low 4 bits, en passant column + 1 in the high 4 bits (0 for none)
+#  byte 33     halfmove clock (capped at 255)
+#  bytes 34-35 fullmove number, big-endian, with the top bit set when black is to move
+packed_codes = {piece: code for code, piece in enumerate(EMPTY + "PKBRQGpkbrqg")}
+#Each possible byte of the board section decoded into the two pieces it holds, so unpacking
+#is one table lookup per pair of squares
+packed_pairs = [None]*256
+for first in packed_codes:
+    for second in packed_codes:
+        packed_pairs[packed_codes[first] | packed_codes[second] << 4] = (first, second)
+
+def pack_position(position):
+    squares = position.squares
+    data = bytearray(packed_codes[squares[s]] | packed_codes[squares[s+1]] << 4 for s in range(0, 64, 2))
+    ep_column = position.ep_square % 8 + 1 if position.ep_square is not None else 0
+    fullmove_number = min(position.fullmove_number, 0x7fff) | (0x8000 if position.turn == BLACK else 0)
+    data += bytes((position.castling | ep_column << 4, min(position.halfmove_clock, 255),
+                   fullmove_number >> 8, fullmove_number & 0xff))
+    return bytes(data)
+
+def unpack_position(data):
+    squares = []
+    for byte in data[:32]:
+        squares.extend(packed_pairs[byte])
+    turn = BLACK if data[34] & 0x80 else WHITE
+    ep_column = data[32] >> 4
+    ep_square = None
+    if ep_column:
+        #The en passant square is behind the pawn that just moved: row 5 (rank 3) or row 2 (rank 6)
+        ep_square = (5 if turn == BLACK else 2)*8 + ep_column - 1
+    return Position(squares, data[32] & 15, ep_square, turn, data[33], (data[34] & 0x7f) << 8 | data[35])
 
 #Takes a board and prints a representation for the player with a-h,1-8 chess coords
 def display_board(board):
@@ -66,10 +423,13 @@ def display_board(board):
     divider = "  |___|___|___|___|___|___|___|___|"
     print(top)
     print(divider)
-    for row in enumerate(board):
-        num = str(8-row[0])
-        for space in row[1]:
-            num+=" | "+space[0]
+    for row in range(8):
+        num = str(8-row)
+        for square in range(row*8, row*8+8):
+            if board.squares[square] == EMPTY:
+                num+=" | "+base_board_squares[square]
+            else:
+                num+=" | "+board.squares[square]
         num+=" |"
         print (num)
         print(divider)
@@ -85,66 +445,327 @@ def opposing_color(color):
         return "Black(lowercase)"
     return "White(capitals)"
 
-#Takes a piece and a destination space and updates current piece positions with the new positon.
+#Takes a piece and a destination space and moves the piece for the player whose turn it is in the game.
 #If the desination space already contains a piece, that piece is removed and added to the captured pieces dictionary.
 #Piece format = Ra1 (white rook at a1) Desination format = a5 (space a5)
-def move_piece(piece, destination, player, current_board, move=True):
-    if not valid_move(piece, destination, player, current_board):
-        if move:
-            print ("Invalid Move")
-        return False
-
-    intended_positions = copy.deepcopy(current_piece_positions)
-    intended_positions.remove(piece)
-    intended_positions.append(piece[0]+destination)
-
-    for p in current_piece_positions:
-        if p[1:] == destination:
-            intended_positions.remove(p)
-            intended_board = update_board(intended_positions)
-            if not valid_capture(piece, p):
-                if move:
-                    print("Invalid move, can't capture your own piece!")
-                return False
-            elif check_for_check(player, intended_positions, intended_board):
-                if move:
-                    print("Invalid move, can't move into check!")
-                return False
-            elif move:
-                print(p + " captured!")
-                captured_pieces[piece_color(p)]+=[p]
-                current_piece_positions.remove(p)
-
-    intended_board = update_board(intended_positions)
-    if check_for_check(player, intended_positions, intended_board):
-        if move :
-            print("Invalid move, can't move into check!")
-        return False
-
-    if not move:
-        return True
-
-    current_piece_positions.remove(piece)
-    new_piece_position = piece[0]+destination
+#Pawns moving to the last row need a promotion piece letter (Q, R, B or K). Returns a MoveResult.
+def move_piece(game, piece, destination, promotion=None):
+    current_board = game.position
+    player = current_board.turn
+    if game.status != PLAYING:
+        return MoveResult(GAME_OVER, status=game.status)
+    if destination not in square_indexes or piece[1:] not in square_indexes:
+        return MoveResult(INVALID_MOVE)
+    if piece_color(piece) != player:
+        return MoveResult(WRONG_PIECE)
+
+    start = square_indexes[piece[1:]]
+    end = square_indexes[destination]
+    candidates = turn_status(current_board, game.endgames).legal.get((start, end))
+    if candidates is None or current_board.squares[start] != piece[0]:
+        #Not a legal move, work out why
+        target = current_board.squares[end]
+        if target != EMPTY and not valid_capture(piece, target):
+            return MoveResult(OWN_PIECE)
+        if not valid_move(piece, destination, player, current_board):
+            return MoveResult(INVALID_MOVE)
+        return MoveResult(INTO_CHECK)
+
+    chosen = candidates[0]
 
     #Handle Pawn Promotion
-    if piece[0] in "Pp":
-        if destination[1] in "18":
-            new_piece = "XXX"
-            while new_piece not in "rkbqpRKBQP":
-                new_piece = input("Promote your pawn. Enter the letter of the piece type you wish to use.")
-                if new_piece not in "rkbqpRKBQP":
-                    print("Invalid piece type. Please select again.")
-            if piece[0] == "P":
-                new_piece = new_piece.upper()
-            else:
-                new_piece = new_piece.lower()
-            new_piece_position = new_piece+destination
-
-    move_list.append((piece, destination))
-    current_piece_positions.append(new_piece_position)
+    if len(candidates) > 1:
+        if promotion is None:
+            return MoveResult(PROMOTION_NEEDED)
+        chosen = None
+        for m in candidates:
+            if promotion_pieces[move_flag(m)] == promotion.upper():
+                chosen = m
+        if chosen is None:
+            return MoveResult(INVALID_PROMOTION)
+
+    captured = record_move(game, chosen)
+    update_status(game)
+
+    return MoveResult(move=chosen, captured=captured, check=turn_status(current_board, game.endgames).check,
+                      status=game.status)
+
+#Makes an encoded move in the game, adding it to the game's moves and any captured piece to the
+#captured pieces. Doesn't check the move is legal or update the game status.
+#A game's moves are never taken back, so after a capture or pawn move, when no earlier position can
+#come up again, the undo records and repetition counts are dropped to keep only what's needed for
+#repetitions. Returns the captured piece in the "Ra1" format, or None.
+def record_move(game, move):
+    position = game.position
+    captured = make_move(position, move)
+    if position.halfmove_clock == 0:
+        del position.history[:]
+        position.repetitions = {position.key: 1}
+    game.moves.append(move)
+    if captured == EMPTY:
+        return None
+    end = move_destination(move)
+    if move_flag(move) == EN_PASSANT:
+        end = end+8 if captured == "p" else end-8
+    captured += square_names[end]
+    game.captured_pieces[piece_color(captured)]+=[captured]
+    return captured
+
+#Makes a move given as text in the "Pa2 a4" format. This is the entry point for programs
+#driving games, it never reads input or prints. Returns a MoveResult.
+def apply_move(game, text, promotion=None):
+    if len(text) != 6 or text in ["moves", "captured", "quit", "resign"] or not valid_input(text):
+        return MoveResult(INVALID_INPUT)
+    piece, destination = text.split()
+    return move_piece(game, piece, destination, promotion)
+
+#Turns an encoded move into the "Pa2 a4" text apply_move takes and the promotion piece letter (or None)
+def move_input(position, move):
+    start, end = move_start(move), move_destination(move)
+    return position.squares[start] + square_names[start] + " " + square_names[end], promotion_pieces.get(move_flag(move))
+
+#Writes a move as start and destination squares, e.g. "e2e4", with the promotion piece added
+def move_text(move):
+    text = square_names[move_start(move)] + square_names[move_destination(move)]
+    if move_flag(move) in promotion_pieces:
+        text += promotion_pieces[move_flag(move)]
+    return text
+
+#Standard algebraic notation uses N for knights and K for kings, this game uses K and G
+san_pieces = {"N": "K", "B": "B", "R": "R", "Q": "Q", "K": "G"}
+
+#Finds the legal move for the player to move written in standard algebraic notation,
+#e.g. "Nf3", "exd5", "O-O", "e8=Q+" or "Rad1". Returns the encoded move, or None if no single
+#legal move matches.
+def san_to_move(position, san):
+    san = san.rstrip("+#!?")
+    moves = generate_legal_moves(position, position.turn)
+    if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        kingside = len(san) == 3
+        for m in moves:
+            if move_flag(m) == CASTLE and (move_destination(m) > move_start(m)) == kingside:
+                return m
+        return None
+
+    promotion = None
+    if "=" in san:
+        san, promotion = san.split("=", 1)
+    elif san[-1:] in san_pieces and san[:1].islower():
+        san, promotion = san[:-1], san[-1]
+    if promotion is not None:
+        if promotion not in san_pieces:
+            return None
+        promotion = san_pieces[promotion]
+
+    kind = "P"
+    if san[:1] in san_pieces:
+        kind, san = san_pieces[san[0]], san[1:]
+    san = san.replace("x", "")
+    destination, hint = san[-2:], san[:-2]
+    if destination not in square_indexes:
+        return None
+    end = square_indexes[destination]
+
+    found = None
+    for m in moves:
+        start = move_start(m)
+        if move_destination(m) != end or position.squares[start].upper() != kind:
+            continue
+        if any(c not in square_names[start] for c in hint):
+            continue
+        if promotion_pieces.get(move_flag(m)) != promotion:
+            continue
+        if found is not None:
+            return None     #Ambiguous
+        found = m
+    return found
+
+#Everything a turn needs to know about a position for the player to move, worked out once:
+#whether they are in check, their legal moves and the state of the game (PLAYING, CHECKMATE,
+#STALEMATE, REPETITION or FIFTY_MOVES). legal maps (start, destination) to the legal moves
+#between those squares, which is more than one move only for a promotion.
+#endgames, if given, is an endgame table: a position it has as mated or stalemated (0 plies to go)
+#is known to have no moves without generating them.
+class TurnStatus(object):
+    __slots__ = ("check", "legal", "status")
+
+    def __init__(self, position, endgames=None):
+        player = position.turn
+        self.check = check_for_check(player, position)
+        self.legal = {}
+        hit = endgames.probe(position) if endgames is not None else None
+        if hit is None or hit[1] != 0:
+            for m in generate_legal_moves(position, player):
+                self.legal.setdefault((move_start(m), move_destination(m)), []).append(m)
+        if not self.legal:
+            self.status = CHECKMATE if self.check else STALEMATE
+        elif threefold_repetition(position):
+            self.status = REPETITION
+        elif fifty_move_rule(position):
+            self.status = FIFTY_MOVES
+        else:
+            self.status = PLAYING
+
+#The TurnStatus of recently seen positions. Positions are looked up by Zobrist key together with
+#whether a draw can be claimed, since the repetition count and fifty-move clock aren't part of the key.
+#Holds at most size positions, dropping the least recently used. Shared by every game in the process.
+class StatusCache(object):
+    __slots__ = ("size", "entries", "hits", "misses")
+
+    def __init__(self, size=4096):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, position, endgames=None):
+        key = (position.key, threefold_repetition(position), fifty_move_rule(position))
+        status = self.entries.get(key)
+        if status is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return status
+        self.misses += 1
+        status = TurnStatus(position, endgames)
+        self.entries[key] = status
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return status
+
+status_cache = StatusCache()
+
+#Returns the TurnStatus of a position, from the cache when it has been seen recently.
+#endgames is an endgame table to look the position up in first, or None.
+def turn_status(position, endgames=None):
+    return status_cache.lookup(position, endgames)
+
+#Works out the state of a position for the player to move: PLAYING, CHECKMATE, STALEMATE,
+#REPETITION or FIFTY_MOVES
+def game_status(current_board, endgames=None):
+    return turn_status(current_board, endgames).status
+
+#Updates the game's status and winner after a move
+def update_status(game):
+    game.status = game_status(game.position, game.endgames)
+    if game.status == CHECKMATE:
+        game.winner = opposing_color(game.player)
+
+#Ends the game with the given player resigning
+def resign(game, player):
+    game.status = RESIGNED
+    game.winner = opposing_color(player)
+
+#Makes a move on a position in place, handling captures, castling, en passant and promotion,
+#and updates the Zobrist key, repetition count and fifty-move clock as it goes.
+#Everything needed to take the move back is pushed onto the position's history so
+#unmake_move can restore it. Returns the captured piece, or EMPTY.
+def make_move(position, move):
+    squares = position.squares
+    start, end, flag = move_start(move), move_destination(move), move_flag(move)
+    piece = squares[start]
+    captured_square = end
+    if flag == EN_PASSANT:
+        captured_square = end+8 if piece == "P" else end-8
+    captured = squares[captured_square]
+    key = position.key
+    position.history.append((move, captured, position.castling, position.ep_square,
+                             position.halfmove_clock, key))
+
+    if captured != EMPTY:
+        squares[captured_square] = EMPTY
+        key ^= zobrist_pieces[captured][captured_square]
+    squares[end] = piece
+    squares[start] = EMPTY
+    key ^= zobrist_pieces[piece][start] ^ zobrist_pieces[piece][end]
+    if piece == "G":
+        position.kings[WHITE] = end
+    elif piece == "g":
+        position.kings[BLACK] = end
+
+    if flag == CASTLE:
+        if end > start:   #Kingside, rook jumps from the corner to the other side of the king
+            rook_start, rook_end = start+3, start+1
+        else:
+            rook_start, rook_end = start-4, start-1
+        rook = squares[rook_start]
+        squares[rook_end] = rook
+        squares[rook_start] = EMPTY
+        key ^= zobrist_pieces[rook][rook_start] ^ zobrist_pieces[rook][rook_end]
+    elif flag >= PROMOTE_KNIGHT:
+        new_piece = promotion_pieces[flag]
+        if piece == "p":
+            new_piece = new_piece.lower()
+        squares[end] = new_piece
+        key ^= zobrist_pieces[piece][end] ^ zobrist_pieces[new_piece][end]
+
+    #Any move from or to a king or rook starting square removes the matching castling rights
+    castling = position.castling & castling_masks[start] & castling_masks[end]
+    key ^= zobrist_castling[position.castling] ^ zobrist_castling[castling]
+    position.castling = castling
+
+    #The en passant square is only recorded when an enemy pawn is actually placed to use it,
+    #so positions that differ only in an unusable en passant square share a key.
+    if position.ep_square is not None:
+        key ^= zobrist_ep[position.ep_square]
+    position.ep_square = None
+    if flag == DOUBLE_PUSH:
+        ep_square = (start+end)//2
+        if piece == "P":
+            color, enemy_pawn = WHITE, "p"
+        else:
+            color, enemy_pawn = BLACK, "P"
+        for s in pawn_attacks[color][ep_square]:
+            if squares[s] == enemy_pawn:
+                position.ep_square = ep_square
+                key ^= zobrist_ep[ep_square]
+                break
 
-    return True
+    if piece in "Pp" or captured != EMPTY:
+        position.halfmove_clock = 0
+    else:
+        position.halfmove_clock += 1
+    if position.turn == BLACK:
+        position.fullmove_number += 1
+    position.turn = opposing_color(position.turn)
+    key ^= zobrist_black
+    position.key = key
+    position.repetitions[key] = position.repetitions.get(key, 0) + 1
+    return captured
+
+#Takes back the last move made on a position with make_move
+def unmake_move(position):
+    repetitions = position.repetitions
+    if repetitions[position.key] == 1:
+        del repetitions[position.key]
+    else:
+        repetitions[position.key] -= 1
+    move, captured, position.castling, position.ep_square, position.halfmove_clock, position.key = position.history.pop()
+    position.turn = opposing_color(position.turn)
+    if position.turn == BLACK:
+        position.fullmove_number -= 1
+    squares = position.squares
+    start, end, flag = move_start(move), move_destination(move), move_flag(move)
+    piece = squares[end]
+    if flag >= PROMOTE_KNIGHT:
+        piece = "P" if piece.isupper() else "p"
+    squares[start] = piece
+    if piece == "G":
+        position.kings[WHITE] = start
+    elif piece == "g":
+        position.kings[BLACK] = start
+
+    if flag == EN_PASSANT:
+        squares[end] = EMPTY
+        squares[end+8 if piece == "P" else end-8] = captured
+    else:
+        squares[end] = captured
+        if flag == CASTLE:
+            if end > start:
+                squares[start+3] = squares[start+1]
+                squares[start+1] = EMPTY
+            else:
+                squares[start-4] = squares[start-1]
+                squares[start-1] = EMPTY
 
 #Checks if a given piece can capture another piece
 def valid_capture(moving_piece, threatened_piece):
@@ -152,237 +773,183 @@ def valid_capture(moving_piece, threatened_piece):
         return False
     return True
 
-#Checks if given move is valid. The move piece function already ensures that a piece cannot capture a friendly piece.
+#Checks if given move is valid for the piece, ignoring whether it leaves the king in check.
+#The move piece function already ensures that a piece cannot capture a friendly piece.
 def valid_move(piece, destination, player, current_board):
-    coords = piece_coords(piece)
-
-    if destination[1] not in row_indexes or destination[0] not in column_indexes:
+    if destination not in square_indexes or piece[1:] not in square_indexes:
         return False
 
-    destination_coords = row_indexes[destination[1]],column_indexes[destination[0]]
-
-    if coords == destination_coords:
+    squares = current_board.squares
+    start = square_indexes[piece[1:]]
+    end = square_indexes[destination]
+    if squares[start] != piece[0]:
         return False
-
-    if piece not in current_board[coords[0]]:
+    target = squares[end]
+    if target != EMPTY and target.isupper() == piece[0].isupper():
         return False
 
-    #Check Rook
-    if piece[0]in "Rr":
-        return check_rook(piece, destination,coords,destination_coords,current_board)
-
-    #Check Knight
-    if piece[0]in "Kk":
-        move_possibilities = []
-        for pos in [(-2,-1),(-2,1),(-1,-2),(-1,2)]:
-            move_possibilities.append((coords[0]+pos[0],coords[1]+pos[1]))
-            move_possibilities.append((coords[0]-pos[0],coords[1]+pos[1]))
-        if destination_coords not in move_possibilities:
+    kind = piece[0].upper()
+    #Sliders need the destination on one of their lines with nothing in between
+    if kind in slider_lines:
+        if end not in slider_lines[kind][start]:
             return False
-        return True
-
-    #Check Pawn
-    if piece[0]== "P":   #Checks for white pawns
-        #If pawn has not moved, check if the player is trying to move it two spaces.
-        if coords[0] == 6:
-            if destination_coords[0] == coords[0]-2:
-                if piece_at(destination,current_board) not in " X" or current_board[coords[0]-1][coords[1]] not in " X" or destination_coords[1] != coords[1]:
-                    return False
-                return True
-        #Checks pawn moves other than moving two spaces
-        if destination_coords[0] != coords[0]-1: #If pawn does not move into the next row, return false
-            return False
-        #Pawn cannot move anywhere other than the 3 spaces in front of it.
-        if abs(destination_coords[1]-coords[1]) > 1:
-            return False
-        if destination_coords[1] == coords[1]:  #If pawn is moving straight, it cannot capture
-            if piece_at(destination,current_board) not in " X":
+        for s in between[start][end]:
+            if squares[s] != EMPTY:
                 return False
-        if abs(destination_coords[1]-coords[1]) == 1: #If pawn is moving digonally, that space must contain a piece to capture...
-            if piece_at(destination,current_board) not in " X":
-                return True
-            #unless capturing en passent. In this case, check the last move in the movelist for a black pawn that moved 2 spaces forward and ended next to the white pawn.
-            if piece[2] == "5":                                                                                   #In the same column the pawn is attempting to move into
-                if move_list[-1][0][0] == "p" and move_list[-1][0][2] == "7" and move_list[-1][1][1] == "5" and piece_coords(move_list[-1][0])[1] == destination_coords[1]:
-                    captured_pieces["Black(lowercase)"]+=move_list[-1][0]
-                    current_piece_positions.remove(move_list[-1][0][0]+move_list[-1][1])
-                    return True
-            return False
         return True
-
-    if piece[0]== "p": #Checks for black pawns
-        if coords[0] == 1:
-            if destination_coords[0] == coords[0]+2:
-                if piece_at(destination,current_board) not in " X" or current_board[coords[0]+1][coords[1]] not in " X" or destination_coords[1] != coords[1]:
-                    return False
-                return True
-        #Checks pawn moves other than moving two spaces
-        if destination_coords[0] != coords[0]+1: #If pawn does not move into the next row, return false
-            return False
-        #Pawn cannot move aywhere other than the 3 spaces in front of it.
-        if abs(destination_coords[1]-coords[1]) > 1:
-            return False
-        if destination_coords[1] == coords[1]:  #If pawn is moving straight, it cannot capture
-            if piece_at(destination,current_board) not in " X":
-                return False
-        if abs(destination_coords[1]-coords[1]) == 1: #If pawn is moving digonally, it must capture
-            if piece_at(destination,current_board) not in " X":
-                return True
-            #unless capturing en passent. In this case, check the last move in the movelist for a black pawn that moved 2 spaces forward and ended next to the white pawn.
-            if piece[2] == "4":
-                if move_list[-1][0][0] == "P" and move_list[-1][0][2] == "2" and move_list[-1][1][1] == "4" and piece_coords(move_list[-1][0])[1] == destination_coords[1]:
-                    captured_pieces["White(capitals)"]+=move_list[-1][0]
-                    current_piece_positions.remove(move_list[-1][0][0]+move_list[-1][1])
-                    return True
-            return False
-        return True
-
-    #Check King
-    if piece[0]in "Gg":
-        if abs(destination_coords[0]-coords[0]) <=1 and abs(destination_coords[1]-coords[1]) <=1:
+    if kind == "K":
+        return end in knight_attacks[start]
+
+    #Pawns and kings have special moves, so compare against the moves generated for them
+    moves = []
+    generate_piece_moves(current_board, start, moves)
+    if kind == "G":
+        generate_castling_moves(current_board, player, moves)
+    for m in moves:
+        if move_destination(m) == end:
             return True
-        if abs(destination_coords[1]-coords[1]) == 2 and (destination_coords[0]-coords[0]) == 0:   #Castling attempt
-            for p, dest in move_list:    #If the king has already moved, it can't castle
-                if p[0] == piece[0]:
-                    return False
-            if (destination_coords[1]-coords[1]) == 2:   #Determine which rook to move...
-                if piece[0] == "G":
-                    rook = "Rh1"
-                    rook_dest = "f1"
-                else:
-                    rook = "rh8"
-                    rook_dest = "e8"
+    return False
+
+#Adds every move the piece on the given square could make to moves, without checking
+#whether the move leaves its own king in check. Castling is handled by generate_castling_moves.
+def generate_piece_moves(position, square, moves):
+    squares = position.squares
+    piece = squares[square]
+    white = piece.isupper()
+    kind = piece.upper()
+
+    if kind == "P":
+        color = WHITE if white else BLACK
+        ahead = pawn_pushes[color][square]
+        if squares[ahead] == EMPTY:
+            if promotion_squares[ahead]:
+                for flag in promotion_pieces:
+                    moves.append(encode_move(square, ahead, flag))
             else:
-                if piece[0] == "G":
-                    rook = "Ra1"
-                    rook_dest = "d1"
+                moves.append(encode_move(square, ahead))
+                double = pawn_double_pushes[color][square]
+                if double is not None and squares[double] == EMPTY:
+                    moves.append(encode_move(square, double, DOUBLE_PUSH))
+        for target_square in pawn_attacks[color][square]:
+            target = squares[target_square]
+            if target != EMPTY and target.isupper() != white:
+                if promotion_squares[target_square]:
+                    for flag in promotion_pieces:
+                        moves.append(encode_move(square, target_square, flag))
                 else:
-                    rook = "ra8"
-                    rook_dest = "c8"
-            for p, dest in move_list:  #And check if it has already been moved
-                if p == rook:
-                    return False
-            if not valid_move(rook, piece[1:],player,current_board): #Rook needs a clear path to the king's current position
-                return False
-
-            if check_for_check(player, current_piece_positions, current_board):
-                print("Can't castle out of check")
-                return False
-
-            intended_positions = copy.deepcopy(current_piece_positions)
-            intended_positions.remove(piece)
-            intended_positions.append(piece[0]+rook_dest)
-            intended_board = update_board(intended_positions)
-            if check_for_check(player, intended_positions, intended_board):
-                print("Cant castle through check!")
-                return False
-
-            move_piece(rook, rook_dest,player,current_board) #Move the rook to correct space
-            return True
-        return False
-
-    #Check Bisop
-    if piece[0] in "Bb":
-        return check_bishop(piece, destination,coords,destination_coords,current_board)
-
-    #Check Queen
-    if piece[0] in "Qq":
-        return check_rook(piece, destination,coords,destination_coords,current_board) or check_bishop(piece, destination,coords,destination_coords,current_board)
-
-#Helper function for checking bishop moves
-def check_bishop(piece, destination,coords,destination_coords,current_board):
-    if destination_coords[0] != coords[0] and destination_coords[1] != coords[1]: #Bishop can't end in the same row or column after moving
-        if coords[0]-destination_coords[0] <0:                             #number of rows moved
-            spaces_moved = abs(coords[0]-destination_coords[0])
-        else:
-            spaces_moved = abs(destination_coords[0]-coords[0])            #number of rows moved
-        if coords[1]-destination_coords[1] <0:
-            c_moved = abs(coords[1]-destination_coords[1])                 #number of columns moved
-        else:
-            c_moved = abs(destination_coords[1]-coords[1])          #number of columns moved
-        if spaces_moved != c_moved:                   #The number of columns moved must match the number of rows moved for diagonal movement
-            return False
+                    moves.append(encode_move(square, target_square))
+            elif target_square == position.ep_square:
+                moves.append(encode_move(square, target_square, EN_PASSANT))
+        return
+
+    if kind == "K" or kind == "G":
+        for target_square in (knight_attacks if kind == "K" else king_attacks)[square]:
+            target = squares[target_square]
+            if target == EMPTY or target.isupper() != white:
+                moves.append(encode_move(square, target_square))
+        return
+
+    for direction in slider_rays[kind][square]:
+        for target_square in direction:
+            target = squares[target_square]
+            if target == EMPTY:
+                moves.append(encode_move(square, target_square))
+            else:
+                if target.isupper() != white:
+                    moves.append(encode_move(square, target_square))
+                break
 
-        if destination_coords[0]-coords[0] <0 and destination_coords[1] - coords[1] <0: #Moving up and to the left
-            for x in range(1,spaces_moved):
-                if current_board[coords[0]-x][coords[1]-x] not in " X":
-                    return False
-            return True
-        if destination_coords[0]-coords[0] <0 and destination_coords[1] - coords[1] >0: #Moving up and to the right
-            for x in range(1,spaces_moved):
-                if current_board[coords[0]-x][coords[1]+x] not in " X":
-                    return False
+#Adds castling moves for the player. The king and rook must still have their castling rights,
+#the squares between them must be empty and the king can't castle out of or through check.
+def generate_castling_moves(position, color, moves):
+    if not position.castling or check_for_check(color, position):
+        return
+    squares = position.squares
+    for right, start, end, passing, empty_squares in castling_paths[color]:
+        if not position.castling & right:
+            continue
+        if any(squares[s] != EMPTY for s in empty_squares):
+            continue
+        if is_square_attacked(position, passing, opposing_color(color)):
+            continue
+        moves.append(encode_move(start, end, CASTLE))
+
+#Returns every move the player could make, without checking for check
+def generate_pseudo_moves(position, color):
+    moves = []
+    white = color == WHITE
+    for square, piece in enumerate(position.squares):
+        if piece != EMPTY and piece.isupper() == white:
+            generate_piece_moves(position, square, moves)
+    generate_castling_moves(position, color, moves)
+    return moves
+
+#Returns every legal move for the player: moves that don't leave their own king in check
+def generate_legal_moves(position, color):
+    legal_moves = []
+    for m in generate_pseudo_moves(position, color):
+        make_move(position, m)
+        if not check_for_check(color, position):
+            legal_moves.append(m)
+        unmake_move(position)
+    return legal_moves
+
+#Determines whether a square is attacked by any piece of the given color.
+#Works outward from the square: a knight, king or pawn attacks it only from one of a few
+#precomputed squares, and a slider only from the first piece met along each ray.
+def is_square_attacked(position, square, by_color):
+    squares = position.squares
+    if by_color == WHITE:
+        pawn, knight, bishop, rook, queen, king = "PKBRQG"
+    else:
+        pawn, knight, bishop, rook, queen, king = "pkbrqg"
+
+    for s in knight_attacks[square]:
+        if squares[s] == knight:
             return True
-        if destination_coords[0]-coords[0] >0 and destination_coords[1] - coords[1] <0: #Moving down and to the left
-            for x in range(1,spaces_moved):
-                if current_board[coords[0]+x][coords[1]-x] not in " X":
-                    return False
+    #A pawn attacks the square from where a pawn of the other color on the square would attack
+    for s in pawn_attacks[opposing_color(by_color)][square]:
+        if squares[s] == pawn:
             return True
-        if destination_coords[0]-coords[0] >0 and destination_coords[1] - coords[1] >0: #Moving down and to the right
-            for x in range(1,spaces_moved):
-                if current_board[coords[0]+x][coords[1]+x] not in " X":
-                    return False
+    for s in king_attacks[square]:
+        if squares[s] == king:
             return True
+    for direction in rook_rays[square]:
+        for s in direction:
+            piece = squares[s]
+            if piece != EMPTY:
+                if piece == rook or piece == queen:
+                    return True
+                break
+    for direction in bishop_rays[square]:
+        for s in direction:
+            piece = squares[s]
+            if piece != EMPTY:
+                if piece == bishop or piece == queen:
+                    return True
+                break
     return False
 
-#Helper function for checking rook moves
-def check_rook(piece, destination,coords,destination_coords,current_board):
-    if coords[0] != destination_coords[0] and coords[1] != destination_coords[1]:
-        return False
-    if coords[0] != destination_coords[0]:  #Piece is moving in column
-        if coords[0] > destination_coords[0]:  #Piece is moving up
-            for space in range(destination_coords[0]+1,coords[0]):
-                if current_board[space][coords[1]] not in " X":
-                    return False
-            return True
-        else:                                  #Piece is moving down
-            for space in range(coords[0]+1,destination_coords[0]):
-                if current_board[space][coords[1]] not in " X":
-                    return False
-            return True
-
-    else:                                      #Piece is moving in row
-        if coords[1] > destination_coords[1]:  #Piece is moving left
-            for space in range(destination_coords[1]+1,coords[1]):
-                if current_board[coords[0]][space] not in " X":
-                    return False
-            return True
-        else:                                  #Piece is moving right
-            for space in range(coords[1]+1,destination_coords[1]):
-                if current_board[coords[0]][space] not in " X":
-                    return False
-            return True
-
 #Determines whether king of specified color is in check.
-def check_for_check(color, piece_positions,current_board):
-    for p in piece_positions:
-        if piece_color(p) == color and p[0] in "Gg":
-            king = p
-
-    for p in piece_positions:
-        if piece_color(p) == opposing_color(color):
-            if valid_move(p, king[1:], opposing_color(color), current_board) and valid_capture(p, king):
-                return True
-
-    return False
+def check_for_check(color, current_board):
+    return is_square_attacked(current_board, current_board.kings[color], opposing_color(color))
 
 #Determines if player has any valid moves.
-def check_for_mate(color, piece_positions, current_board):
-    for p in piece_positions:
-        if piece_color(p) == color:
-            for space in all_spaces:
-                if move_piece(p, space, color, current_board, move=False):
-                    return False
+def check_for_mate(color, current_board):
+    if generate_legal_moves(current_board, color):
+        return False
     return True  #No valid move was found, therefore player is in checkmate or stalemate
 
-#Draw occurs when both players move the same piece back and forth.
-def check_draw():
-    if len(move_list) < 8:
-        return False
-    if move_list[-1] == move_list[-5] and move_list[-2] == move_list[-6] and\
-       move_list[-3] == move_list[-7] and move_list[-4] == move_list[-8]:
-        return True
-    return False
+#Draw by repetition: the same position, with the same player to move, has come up three times.
+def threefold_repetition(current_board):
+    return current_board.repetitions[current_board.key] >= 3
+
+#Draw by the fifty-move rule: fifty moves each without a capture or a pawn move.
+def fifty_move_rule(current_board):
+    return current_board.halfmove_clock >= 100
+
+def check_draw(current_board):
+    return threefold_repetition(current_board) or fifty_move_rule(current_board)
 
 #Checks if user input is valid
 def valid_input(inp):
@@ -395,86 +962,136 @@ def valid_input(inp):
         return False
     return True
 
-#Main game loop
-def greg_chess():
+#The functions counted and timed when profiling is turned on: the ones every turn runs through
+profiled_functions = ["move_piece", "record_move", "turn_status", "generate_legal_moves", "make_move", "unmake_move",
+                      "check_for_check", "is_square_attacked"]
+
+#Main game loop. A terminal front end: all of the game rules are in apply_move and game_status.
+#computer is the color the computer plays (WHITE or BLACK), or None for two human players.
+#The computer gets time_ms milliseconds per move.
+#profile turns on profiling (see GregProfile) and stats_file is where to write cProfile statistics;
+#both default to the GREGCHESS_PROFILE and GREGCHESS_PROFILE_STATS environment variables.
+#The profile report is printed when the game ends, however it ends.
+def greg_chess(computer=None, time_ms=1000, profile=None, stats_file=None):
+    if profile is None:
+        profile = os.environ.get("GREGCHESS_PROFILE", "").lower() not in ("", "0", "false", "no", "off")
+    stats_file = stats_file or os.environ.get("GREGCHESS_PROFILE_STATS")
+    #The computer player is loaded before profiling starts so it keeps the unwrapped functions
+    endgames = None
+    if computer is not None:
+        from GregSearch import TranspositionTable, best_move
+        from GregBook import open_book, open_endgame_table
+        table = TranspositionTable()
+        book = open_book()
+        endgames = open_endgame_table()
+    profiler = None
+    if profile or stats_file:
+        from GregProfile import Profiler
+        profiler = Profiler(stats_file)
+        profiler.start(globals(), profiled_functions)
     print (rules)
-    player = 'White(capitals)'
-    while True:
-        #Need to manipulate the global active_board
-        global active_board
-        active_board = update_board(current_piece_positions)
-
-        print ("It's the %(player)s player's Turn"%{'player':player})
-        display_board(active_board)
-
-        #Announce check if the last move threatens the current player's king...
-        print("checking check...")
-        if check_for_check(player, current_piece_positions, active_board):
-            print (player + "'s king is in check!")
-            #And check for mate
-            print("checking for mate...")
-            if check_for_mate(player, current_piece_positions, active_board):
-                print ("Checkmate! {} wins!".format(opposing_color(player)))
+    game = Game(endgames=endgames)
+    active_board = game.position
+    try:
+        while True:
+            player = game.player
+            print ("It's the %(player)s player's Turn"%{'player':player})
+            display_board(active_board)
+
+            #Announce check if the last move threatens the current player's king...
+            print("checking check...")
+            if turn_status(active_board, game.endgames).check:
+                print (player + "'s king is in check!")
+                #And check for mate
+                print("checking for mate...")
+
+            if game.status == CHECKMATE:
+                print ("Checkmate! {} wins!".format(game.winner))
                 print ("Thanks for playing!")
                 break
 
-        if not check_for_check(player, current_piece_positions, active_board):
-            if check_for_mate(player, current_piece_positions, active_board):
+            if game.status == STALEMATE:
                 print("{} has no valid moves! Stalemate!".format(player))
                 print ("Thanks for playing!")
                 break
 
-        if check_draw():
-            print ("Draw! Too many repeated moves!")
-            print ("Thanks for playing!")
-            break
+            if game.status == REPETITION:
+                print ("Draw! The same position has come up three times!")
+                print ("Thanks for playing!")
+                break
 
-        #Get input from the user in the form "piece destination" --> "Pa2 a4"
-        #Selects pawn at a2 and moves it to a4.
-        next_move = input("%(player)s player, enter your next move"%{'player':player})
+            if game.status == FIFTY_MOVES:
+                print ("Draw! Fifty moves without a capture or a pawn move!")
+                print ("Thanks for playing!")
+                break
 
-        if not valid_input(next_move):
-            print("Invalid input!")
-            continue
+            if player == computer:
+                turn_start = time.perf_counter()
+                next_move, promotion = best_move(game, time_ms, table, book=book, endgames=endgames)
+                result = apply_move(game, next_move, promotion)
+                if profiler is not None:
+                    profiler.turn(time.perf_counter() - turn_start)
+                print("The computer moves {}{}".format(next_move, " and promotes to " + promotion if promotion else ""))
+                if result.captured is not None:
+                    print(result.captured + " captured!")
+                continue
+
+            #Get input from the user in the form "piece destination" --> "Pa2 a4"
+            #Selects pawn at a2 and moves it to a4.
+            next_move = input("%(player)s player, enter your next move"%{'player':player})
+
+            if not valid_input(next_move):
+                print("Invalid input!")
+                continue
+
+            #Player can type quit to end the game
+            if next_move == "quit":
+                print("Thanks for playing")
+                break
 
-        #Player can type quit to end the game
-        if next_move == "quit":
-            print("Thanks for playing")
-            break
+            #Player can check the log of moves made.
+            if next_move == "moves":
+                print(game.move_list)
+                continue
 
-        #Player can check the log of moves made.
-        if next_move == "moves":
-            print(move_list)
-            continue
+            #Player can type "captured" to check the list of captured pieces
+            if next_move == "captured":
+                print(game.captured_pieces)
+                continue
 
-        #Player can type "captured" to check the list of captured pieces
-        if next_move == "captured":
-            print(captured_pieces)
-            continue
-
-        #Player can type "resign" to concede the game.
-        if next_move == "resign":
-            print ("{} resigns! {} wins!".format(player, opposing_color(player)))
-            print ("Thanks for playing!")
-            break
+            #Player can type "resign" to concede the game.
+            if next_move == "resign":
+                resign(game, player)
+                print ("{} resigns! {} wins!".format(player, game.winner))
+                print ("Thanks for playing!")
+                break
 
-        #Moves the specified piece to the specified destination.
-        next_move = next_move.split()
-        if player == 'White(capitals)' and next_move[0][0] not in "PRKBQG":
-            print("Invalid piece for White player!")
-            continue
-        if player == 'Black(lowercase)' and next_move[0][0] not in "prkbqg":
-            print("Invalid piece for Black player!")
-            continue
-        if move_piece(next_move[0], next_move[1], player,active_board):
-            player = opposing_color(player)
+            #Moves the specified piece to the specified destination.
+            turn_start = time.perf_counter()
+            result = apply_move(game, next_move)
+            #Ask which piece a pawn reaching the last row becomes until a valid one is given
+            while result.error in (PROMOTION_NEEDED, INVALID_PROMOTION):
+                if result.error == INVALID_PROMOTION:
+                    print(error_messages[INVALID_PROMOTION])
+                new_piece = input(error_messages[PROMOTION_NEEDED])
+                turn_start = time.perf_counter()
+                result = apply_move(game, next_move, promotion=new_piece)
+            if profiler is not None and result.error is None:
+                profiler.turn(time.perf_counter() - turn_start)
+            if result.error is not None:
+                print(error_messages[result.error].format(player=player.split("(")[0]))
+            elif result.captured is not None:
+                print(result.captured + " captured!")
+    finally:
+        if profiler is not None:
+            profiler.stop()
 
 if __name__ == "__main__":
-    greg_chess()
-
-
-
-
-
-
-
+    parser = argparse.ArgumentParser(description="GregChess")
+    parser.add_argument("--computer", choices=["white", "black"], help="let the computer play this color")
+    parser.add_argument("--time", type=int, default=1000, help="computer thinking time per move in milliseconds")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="count calls and time in the core functions and print a report when the game ends")
+    parser.add_argument("--profile-stats", metavar="FILE", help="also write cProfile statistics to FILE")
+    args = parser.parse_args()
+    greg_chess({"white": WHITE, "black": BLACK, None: None}[args.computer], args.time, args.profile, args.profile_stats)
@@ -0,0 +1,168 @@
+#GregChess evaluation
+#Scores many positions at once with NumPy, for analysis and building training data.
+
+""" Positions are turned into piece planes: a (12, 64) array of 0s and 1s, one row per piece
+letter in the order of plane_pieces and one column per square, a8 first as on the board.
+A batch is a stacked (N, 12, 64) array and is scored with array operations over the whole batch,
+without a Python loop per position.
+
+The score, in centipawns from white's side, adds up:
+  material and square bonuses - the same piece_scores the search uses
+  mobility                    - squares each knight, bishop, rook and queen can move to
+  king safety                 - own pawns sheltering the king, less enemy attacks next to it
+
+Inside the search the score is kept up to date move by move instead (GregSearch.score_change),
+which covers the material and square bonus part without needing NumPy.
+
+Usage:
+python GregEval.py positions.fen        Prints a score for each FEN in the file (one per line)
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from GregChess import EMPTY, WHITE, from_fen, knight_attacks, king_attacks, rook_rays, bishop_rays
+from GregSearch import piece_scores
+
+plane_pieces = "PKBRQGpkbrqg"
+plane_indexes = {piece: plane for plane, piece in enumerate(plane_pieces)}
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)   #White planes; black ones are 6 on
+
+#Material plus square bonus of each piece on each square, from white's side
+score_planes = np.array([piece_scores[piece] for piece in plane_pieces], dtype=np.int32)
+
+#Centipawns for each square a piece can move to
+mobility_weights = {KNIGHT: 4, BISHOP: 5, ROOK: 2, QUEEN: 1}
+#Centipawns for each own pawn one and two rows in front of the king, on its column or next to it
+shield_weights = (10, 5)
+#Centipawns lost for each enemy attack on a square next to the king (or the king's own square)
+king_attack_weight = 8
+
+#The squares along each of the 8 directions from every square (rook directions then bishop
+#directions), nearest first, padded to 8 with 64, a square off the board that counts as occupied
+#so every ray ends in a piece.
+OFF_BOARD = 64
+ray_squares = np.full((64, 8, 8), OFF_BOARD, dtype=np.intp)
+for square in range(64):
+    for direction, squares in enumerate(rook_rays[square] + bishop_rays[square]):
+        ray_squares[square, direction, :len(squares)] = squares
+on_board = ray_squares != OFF_BOARD
+
+#[from square, to square] matrices: knight moves, the squares around a king and pawn shelter
+knight_matrix = np.zeros((64, 64), dtype=np.int32)
+king_zone = np.zeros((64, 64), dtype=np.int32)
+white_shield = np.zeros((64, 64), dtype=np.int32)
+black_shield = np.zeros((64, 64), dtype=np.int32)
+for square in range(64):
+    knight_matrix[square, knight_attacks[square]] = 1
+    king_zone[square, king_attacks[square] + [square]] = 1
+    row, column = divmod(square, 8)
+    for distance, weight in enumerate(shield_weights, 1):
+        for c in range(max(column-1, 0), min(column+2, 8)):
+            if row - distance >= 0:
+                white_shield[square, (row-distance)*8 + c] = weight
+            if row + distance < 8:
+                black_shield[square, (row+distance)*8 + c] = weight
+
+#Piece planes of one board: a Position (such as update_board returns) or its list of 64 squares
+def board_planes(board):
+    squares = getattr(board, "squares", board)
+    planes = np.zeros((12, 64), dtype=np.uint8)
+    for square, piece in enumerate(squares):
+        if piece != EMPTY:
+            planes[plane_indexes[piece], square] = 1
+    return planes
+
+#Stacks the piece planes of many boards into an (N, 12, 64) array
+def stack_planes(boards):
+    planes = [board_planes(board) for board in boards]
+    if not planes:
+        return np.zeros((0, 12, 64), dtype=np.uint8)
+    return np.stack(planes)
+
+#For every square and direction: the number of empty squares before the first piece along it
+#(empty_run) and that piece's square (blocker, OFF_BOARD at the edge). occupied is (N, 64) booleans.
+def ray_runs(occupied):
+    occupied = np.concatenate([occupied, np.ones((len(occupied), 1), dtype=bool)], axis=1)
+    along = occupied[:, ray_squares]                                    #(N, 64, 8, 8)
+    empty_run = np.logical_and.accumulate(~along, axis=3).sum(axis=3)   #(N, 64, 8)
+    blocker = ray_squares[np.arange(64)[:, None], np.arange(8)[None, :], empty_run]
+    return empty_run, blocker
+
+#Mobility and attacks on the enemy king's zone for the pieces of one color. pieces is the color's
+#(N, 6, 64) planes; own, enemy and enemy_zone are (N, 64) booleans; empty_run and blocker from ray_runs.
+def activity(pieces, own, enemy, enemy_zone, empty_run, blocker):
+    count = len(pieces)
+    enemy_at = np.concatenate([enemy, np.zeros((count, 1), dtype=bool)], axis=1)
+    zone_at = np.concatenate([enemy_zone, np.zeros((count, 1), dtype=bool)], axis=1)
+    #A slider can move to the empty squares along a ray and capture the first piece if it is an enemy.
+    #It attacks the empty squares and the first piece whatever its color.
+    reach = empty_run + np.take_along_axis(enemy_at, blocker.reshape(count, -1), axis=1).reshape(count, 64, 8)
+    attacked = (np.arange(8) <= empty_run[..., None]) & on_board
+    zone_hits = (attacked & zone_at[:, ray_squares]).sum(axis=3)
+    rook_reach, bishop_reach = reach[..., :4].sum(axis=2), reach[..., 4:].sum(axis=2)
+    rook_hits, bishop_hits = zone_hits[..., :4].sum(axis=2), zone_hits[..., 4:].sum(axis=2)
+    knight_reach = (~own).astype(np.int32) @ knight_matrix.T
+    knight_hits = enemy_zone.astype(np.int32) @ knight_matrix.T
+
+    mobility = mobility_weights[KNIGHT]*(pieces[:, KNIGHT]*knight_reach).sum(axis=1) + \
+               mobility_weights[BISHOP]*(pieces[:, BISHOP]*bishop_reach).sum(axis=1) + \
+               mobility_weights[ROOK]*(pieces[:, ROOK]*rook_reach).sum(axis=1) + \
+               mobility_weights[QUEEN]*(pieces[:, QUEEN]*(rook_reach + bishop_reach)).sum(axis=1)
+    attacks = (pieces[:, KNIGHT]*knight_hits).sum(axis=1) + \
+              (pieces[:, BISHOP]*bishop_hits).sum(axis=1) + \
+              (pieces[:, ROOK]*rook_hits).sum(axis=1) + \
+              (pieces[:, QUEEN]*(rook_hits + bishop_hits)).sum(axis=1)
+    return mobility, attacks
+
+#Scores an (N, 12, 64) batch of piece planes. Returns an (N,) array of scores from white's side,
+#or for the player to move when white_to_move (an (N,) array of booleans) is given.
+#Large batches are scored chunk_size positions at a time to bound the memory used.
+def evaluate_batch(planes, white_to_move=None, chunk_size=4096):
+    planes = np.asarray(planes)
+    scores = np.empty(len(planes), dtype=np.int32)
+    for first in range(0, len(planes), chunk_size):
+        scores[first:first+chunk_size] = evaluate_chunk(planes[first:first+chunk_size].astype(np.int32))
+    if white_to_move is not None:
+        scores = np.where(white_to_move, scores, -scores)
+    return scores
+
+def evaluate_chunk(planes):
+    white_pieces, black_pieces = planes[:, :6], planes[:, 6:]
+    white = white_pieces.sum(axis=1) > 0
+    black = black_pieces.sum(axis=1) > 0
+    white_zone = (white_pieces[:, KING] @ king_zone) > 0
+    black_zone = (black_pieces[:, KING] @ king_zone) > 0
+
+    material = np.einsum("npq,pq->n", planes, score_planes)
+    empty_run, blocker = ray_runs(white | black)
+    white_mobility, white_attacks = activity(white_pieces, white, black, black_zone, empty_run, blocker)
+    black_mobility, black_attacks = activity(black_pieces, black, white, white_zone, empty_run, blocker)
+    shelter = np.einsum("nk,kq,nq->n", white_pieces[:, KING], white_shield, white_pieces[:, PAWN]) - \
+              np.einsum("nk,kq,nq->n", black_pieces[:, KING], black_shield, black_pieces[:, PAWN])
+    king_safety = shelter - king_attack_weight*(black_attacks - white_attacks)
+    return material + white_mobility - black_mobility + king_safety
+
+#Scores one position for the player to move with the full evaluation
+def evaluate(position):
+    return int(evaluate_batch(board_planes(position)[None], [position.turn == WHITE])[0])
+
+def main():
+    parser = argparse.ArgumentParser(description="Score positions with the GregChess evaluation")
+    parser.add_argument("positions", help="file with one FEN per line")
+    args = parser.parse_args()
+
+    with open(args.positions) as f:
+        fens = [line.strip() for line in f if line.strip()]
+    positions = [from_fen(fen) for fen in fens]
+    start = time.perf_counter()
+    scores = evaluate_batch(stack_planes(positions), np.array([p.turn == WHITE for p in positions]))
+    elapsed = time.perf_counter() - start
+    for fen, score in zip(fens, scores):
+        print("{:>6}  {}".format(score, fen))
+    print("{} positions in {:.3f}s".format(len(fens), elapsed))
+
+if __name__ == "__main__":
+    main()
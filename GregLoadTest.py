@@ -0,0 +1,112 @@
+#GregChess load test
+#Plays many games against GregServer at once and reports how fast the server handles moves.
+
+""" Opens two connections per game, so the server pairs them into games, and has every player
+make random legal moves as soon as it is their turn. Latency is the time from sending a move to
+receiving the board update for it. At the end it prints the number of moves made, the moves
+per second over the whole run and the median and 99th percentile latency.
+
+Games that haven't ended after --max-moves moves are resigned.
+
+Usage:
+python GregServer.py &
+python GregLoadTest.py --games 200
+python GregLoadTest.py --games 200 --local    (runs the server in this process instead)
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from GregChess import from_fen, generate_legal_moves, move_input
+from GregServer import start_server
+
+#Plays one side of one game with random legal moves, adding the latency of each move to latencies.
+#Returns how the game ended, from the server's "over" line.
+async def play(host, port, rng, max_moves, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    color = None
+    sent = None
+    ending = None
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            kind, _, rest = line.decode().rstrip("\n").partition(" ")
+            if kind in ("board", "over") and sent is not None:
+                latencies.append(time.perf_counter() - sent)
+                sent = None
+            if kind == "start":
+                color = rest.split()[1]
+            elif kind == "over":
+                ending = rest
+                break
+            elif kind == "error":
+                sent = None
+                writer.write(b"resign\n")
+            elif kind == "board":
+                position = from_fen(rest)
+                if position.turn != color:
+                    continue
+                moves = generate_legal_moves(position, color)
+                if not moves:
+                    continue
+                if position.fullmove_number > max_moves:
+                    writer.write(b"resign\n")
+                    continue
+                text, promotion = move_input(position, rng.choice(moves))
+                writer.write((text + ("=" + promotion if promotion else "") + "\n").encode())
+                sent = time.perf_counter()
+        writer.write(b"quit\n")
+        await writer.drain()
+    finally:
+        writer.close()
+    return ending
+
+#Returns the value below which the given fraction of the sorted values fall
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values)-1, int(fraction*len(values)))]
+
+async def load_test(host, port, games, max_moves, seed, local):
+    tcp = None
+    if local:
+        tcp = await start_server(host, 0)
+        port = tcp.sockets[0].getsockname()[1]
+    latencies = []
+    start = time.perf_counter()
+    endings = await asyncio.gather(*[play(host, port, random.Random(seed + i), max_moves, latencies)
+                                     for i in range(games*2)])
+    elapsed = time.perf_counter() - start
+    if tcp is not None:
+        tcp.close()
+        await tcp.wait_closed()
+
+    latencies.sort()
+    print("{} games, {} moves in {:.2f}s".format(games, len(latencies), elapsed))
+    print("{:.0f} moves/s".format(len(latencies) / elapsed if elapsed else 0))
+    print("latency p50 {:.2f}ms  p99 {:.2f}ms  max {:.2f}ms".format(
+        percentile(latencies, 0.5)*1000, percentile(latencies, 0.99)*1000, percentile(latencies, 1)*1000))
+    counts = {}
+    for ending in endings:
+        if ending is not None:
+            status = ending.split(" ", 1)[1]
+            counts[status] = counts.get(status, 0) + 1
+    print("endings (per player): " + ", ".join("{} {}".format(n, status) for status, n in sorted(counts.items())))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a GregChess server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8014)
+    parser.add_argument("--games", type=int, default=100, help="number of games played at once")
+    parser.add_argument("--max-moves", type=int, default=100, help="resign games still going after this many moves")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--local", action="store_true", help="run the server in this process")
+    args = parser.parse_args()
+    asyncio.run(load_test(args.host, args.port, args.games, args.max_moves, args.seed, args.local))
+
+if __name__ == "__main__":
+    main()
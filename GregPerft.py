@@ -0,0 +1,164 @@
+#GregChess perft
+#Counts the leaf nodes of the move tree to check move generation against known results
+#and to measure how fast it runs.
+
+""" Usage:
+python GregPerft.py                      Run the reference suite to depth 3
+python GregPerft.py --depth 4            Run the reference suite to depth 4
+python GregPerft.py --fen "<FEN>" --depth 3 --divide
+                                         Count one position, listing the nodes under each move
+python GregPerft.py --workers 8          Split the counting across 8 worker processes
+python GregPerft.py --scaling 8 --depth 4
+                                         Time Kiwipete with 1, 2, 4 and 8 workers and report the speedup
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from GregChess import from_fen, pack_position, unpack_position, generate_legal_moves, make_move, unmake_move, move_text
+
+#Reference positions with their known node counts for depth 1, 2, 3...
+#Positions from the Chess Programming Wiki perft results page.
+suite = [
+    ("Starting position", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 8902, 197281, 4865609, 119060324]),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603, 193690690]),
+    ("Position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 191, 2812, 43238, 674624, 11030083]),
+    ("Position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     [6, 264, 9467, 422333, 15833292]),
+    ("Position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1486, 62379, 2103487, 89941194]),
+    ("Position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594, 164075551]),
+]
+
+#Counts the positions reached after depth moves from the given position
+def perft(position, depth):
+    moves = generate_legal_moves(position, position.turn)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    nodes = 0
+    for m in moves:
+        make_move(position, m)
+        nodes += perft(position, depth-1)
+        unmake_move(position)
+    return nodes
+
+#Like perft, but returns the node count under each move from the position
+def perft_divide(position, depth):
+    counts = {}
+    for m in generate_legal_moves(position, position.turn):
+        make_move(position, m)
+        counts[m] = perft(position, depth-1)
+        unmake_move(position)
+    return counts
+
+#Pool worker: counts the nodes under one root move. The position arrives packed by
+#pack_position, so only a few dozen bytes are sent to the worker for each task.
+def perft_root_move(task):
+    packed, move, depth = task
+    position = unpack_position(packed)
+    make_move(position, move)
+    return move, perft(position, depth-1)
+
+#Like perft_divide, but the root moves are shared out across a multiprocessing pool
+def parallel_perft_divide(position, depth, pool):
+    if depth <= 1:
+        return perft_divide(position, depth)
+    packed = pack_position(position)
+    tasks = [(packed, m, depth) for m in generate_legal_moves(position, position.turn)]
+    return dict(pool.imap_unordered(perft_root_move, tasks))
+
+def parallel_perft(position, depth, pool):
+    if depth <= 1:
+        return perft(position, depth)
+    return sum(parallel_perft_divide(position, depth, pool).values())
+
+#Times perft of a position with 1, 2, 4... up to max_workers processes and prints the speedup over one
+def scaling_report(fen, depth, max_workers):
+    position = from_fen(fen)
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    base = time.perf_counter() - start
+    print("workers  1  {:>10} nodes  {:>8.2f}s  {:>9.0f} nps  speedup 1.00".format(nodes, base, nodes/base))
+    workers = 2
+    while workers <= max_workers:
+        with multiprocessing.Pool(workers) as pool:
+            start = time.perf_counter()
+            nodes = parallel_perft(position, depth, pool)
+            elapsed = time.perf_counter() - start
+        print("workers {:>2}  {:>10} nodes  {:>8.2f}s  {:>9.0f} nps  speedup {:.2f}".format(
+              workers, nodes, elapsed, nodes/elapsed, base/elapsed))
+        if workers < max_workers:
+            workers = min(workers*2, max_workers)
+        else:
+            break
+
+#Runs every suite position to the given depth. Prints the node count, whether it matches the
+#reference count and nodes per second. Returns True if every count matched.
+#pool, if given, is a multiprocessing pool to split the counting across.
+def run_suite(depth, pool=None):
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in suite:
+        position = from_fen(fen)
+        for d in range(1, min(depth, len(counts))+1):
+            start = time.perf_counter()
+            nodes = perft(position, d) if pool is None else parallel_perft(position, d, pool)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            result = "ok" if nodes == counts[d-1] else "FAILED (expected {})".format(counts[d-1])
+            all_passed = all_passed and nodes == counts[d-1]
+            print("{:<18} depth {}  {:>10} nodes  {:>8.2f}s  {:>9.0f} nps  {}".format(
+                  name, d, nodes, elapsed, nodes/elapsed if elapsed else 0, result))
+    print("Total: {} nodes in {:.2f}s, {:.0f} nodes per second".format(
+          total_nodes, total_time, total_nodes/total_time if total_time else 0))
+    return all_passed
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generation counts for GregChess")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fen", help="count this position instead of running the suite")
+    parser.add_argument("--divide", action="store_true", help="list the node count under each move")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--scaling", type=int, metavar="N",
+                        help="report the speedup with up to N workers (Kiwipete unless --fen is given)")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling_report(args.fen or suite[1][1], args.depth, args.scaling)
+        return 0
+
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        if args.fen is None:
+            return 0 if run_suite(args.depth, pool) else 1
+
+        position = from_fen(args.fen)
+        start = time.perf_counter()
+        if args.divide:
+            if pool is None:
+                counts = perft_divide(position, args.depth)
+            else:
+                counts = parallel_perft_divide(position, args.depth, pool)
+            for m in sorted(counts, key=move_text):
+                print("{}: {}".format(move_text(m), counts[m]))
+            nodes = sum(counts.values())
+        elif pool is None:
+            nodes = perft(position, args.depth)
+        else:
+            nodes = parallel_perft(position, args.depth, pool)
+        elapsed = time.perf_counter() - start
+        print("Nodes: {}  Time: {:.2f}s  NPS: {:.0f}".format(nodes, elapsed, nodes/elapsed if elapsed else 0))
+        return 0
+    finally:
+        if pool is not None:
+            pool.close()
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+#GregChess profiling
+#Counts calls and time spent in the core functions and how long each turn takes.
+
+""" Nothing here runs unless profiling is asked for, with --profile (or --profile-stats FILE) on
+the command line or the GREGCHESS_PROFILE (or GREGCHESS_PROFILE_STATS=FILE) environment variable.
+Profiling swaps the named functions in a module's namespace for timed wrappers, so calls made from
+inside that module are counted too, and puts the originals back when it stops. When it is off the
+functions are never wrapped and the only cost is a check per turn.
+
+Times are inclusive: a turn_status call's time includes the generate_legal_moves call it makes,
+which in turn includes its make_move and check_for_check calls.
+"""
+
+import bisect
+import cProfile
+import sys
+import time
+
+#Upper bounds of the turn latency histogram buckets, in milliseconds
+latency_buckets = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")]
+
+class Profiler(object):
+    __slots__ = ("calls", "times", "turns", "namespace", "originals", "stats_file", "cprofile")
+
+    #stats_file, if given, is where to write cProfile statistics for everything run while profiling
+    def __init__(self, stats_file=None):
+        self.calls = {}
+        self.times = {}
+        self.turns = []
+        self.namespace = None
+        self.originals = {}
+        self.stats_file = stats_file
+        self.cprofile = None
+
+    #Wraps a function so each call is counted and timed under name
+    def wrap(self, name, function):
+        calls = self.calls
+        times = self.times
+        perf_counter = time.perf_counter
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                times[name] += perf_counter() - start
+                calls[name] += 1
+        timed.__wrapped__ = function
+        return timed
+
+    #Starts profiling the functions with the given names in namespace (a module's globals())
+    def start(self, namespace, names):
+        self.namespace = namespace
+        for name in names:
+            self.calls[name] = 0
+            self.times[name] = 0.0
+            self.originals[name] = namespace[name]
+            namespace[name] = self.wrap(name, namespace[name])
+        if self.stats_file:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    #Records how long one turn took, in seconds
+    def turn(self, seconds):
+        self.turns.append(seconds)
+
+    #Puts the original functions back, writes the cProfile statistics if asked for and prints the report
+    def stop(self, out=sys.stdout):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.stats_file)
+        self.namespace.update(self.originals)
+        self.originals = {}
+        self.report(out)
+        if self.stats_file:
+            out.write("cProfile statistics written to {} (read them with python -m pstats)\n".format(self.stats_file))
+
+    def report(self, out=sys.stdout):
+        out.write("{:<24}{:>10}{:>12}{:>14}\n".format("function", "calls", "total ms", "us per call"))
+        for name in sorted(self.times, key=self.times.get, reverse=True):
+            calls = self.calls[name]
+            out.write("{:<24}{:>10}{:>12.2f}{:>14.1f}\n".format(name, calls, self.times[name]*1000,
+                                                               self.times[name]*1e6/calls if calls else 0))
+        if not self.turns:
+            return
+        turns = sorted(self.turns)
+        out.write("\nTurn latency over {} turns: p50 {:.2f}ms  p99 {:.2f}ms  max {:.2f}ms\n".format(
+            len(turns), turns[len(turns)//2]*1000, turns[min(len(turns)-1, int(len(turns)*0.99))]*1000, turns[-1]*1000))
+        counts = [0]*len(latency_buckets)
+        for seconds in turns:
+            counts[bisect.bisect_left(latency_buckets, seconds*1000)] += 1
+        first = next(i for i, n in enumerate(counts) if n)
+        last = max(i for i, n in enumerate(counts) if n)
+        for bound, n in zip(latency_buckets[first:last+1], counts[first:last+1]):
+            out.write("  <= {:>8} ms {:>6} {}\n".format(bound, n, "#" * min(n, 60)))
@@ -0,0 +1,166 @@
+#GregChess replay
+#Checks recorded games against the rules by replaying them without the terminal.
+
+""" Reads games from an archive one at a time, replays each with apply_move and writes one JSON
+line per game: whether every move was legal (and if not, the first illegal ply and why), how many
+plies were played, whether the last move gave check and the status the game ended in.
+Threefold repetition and the fifty-move rule are draws a player has to claim, so recorded games
+often go on after them: the replay stops there, reports the draw as the status and counts the
+moves played after it in moves_after_end, without marking them illegal.
+Games are shared out to a pool of worker processes in chunks, and only a few chunks are held in
+memory at once, so archives of any size can be checked.
+
+Archive formats:
+  moves - one game per line, moves in this game's format separated by commas: "Pe2 e4,pe7 e5,..."
+          A promotion is written after the destination: "Pe7 e8=Q". Blank lines and lines
+          starting with # are skipped.
+  pgn   - standard PGN, moves in standard algebraic notation.
+
+Usage:
+python GregReplay.py games.pgn --workers 8 --output results.jsonl
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+
+from GregChess import Game, PLAYING, REPETITION, FIFTY_MOVES, apply_move, san_to_move, move_input
+
+#Yields (game id, moves) for each game in a file in the moves format. The game id is the line number.
+def read_move_lists(lines):
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield number, [m.strip() for m in line.split(",") if m.strip()]
+
+#Yields (game id, tags, moves) for each game in a PGN file. The game id is the number of the game
+#in the file. Comments, variations, move numbers, annotations and results are dropped from the moves.
+def read_pgn(lines):
+    number = 0
+    tags = {}
+    movetext = []
+    for line in itertools.chain(lines, ["[End]"]):
+        line = line.strip()
+        if line.startswith("[") and movetext:
+            number += 1
+            yield number, tags, pgn_moves(" ".join(movetext))
+            tags = {}
+            movetext = []
+        if line.startswith("["):
+            name, _, value = line[1:-1].partition(" ")
+            tags[name] = value.strip('"')
+        elif line and not line.startswith("%"):
+            movetext.append(line)
+
+#Splits PGN movetext into its SAN moves
+def pgn_moves(text):
+    moves = []
+    depth = 0
+    token = ""
+    in_comment = False
+    for c in text + " ":
+        if in_comment:
+            in_comment = c != "}"
+        elif c == "{":
+            in_comment = True
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif depth == 0 and not c.isspace():
+            token += c
+            continue
+        if token:
+            token = token.split(".")[-1]
+            if token and not token.startswith("$") and token not in ("1-0", "0-1", "1/2-1/2", "*"):
+                moves.append(token)
+            token = ""
+    return moves
+
+#Pool worker: replays one game and returns its result as a dict.
+#task is (game id, format, moves, tags) where format is "moves" or "pgn".
+def replay_game(task):
+    game_id, archive_format, moves, tags = task
+    game = Game()
+    result = {"game": game_id}
+    if "Result" in tags:
+        result["recorded_result"] = tags["Result"]
+    check = False
+    for ply, text in enumerate(moves, 1):
+        if game.status in (REPETITION, FIFTY_MOVES):
+            result.update(legal=True, moves_after_end=len(moves) - ply + 1)
+            break
+        if archive_format == "pgn":
+            move = san_to_move(game.position, text)
+            if move is None:
+                result.update(legal=False, ply=ply, move=text, error="no legal move matches")
+                break
+            text, promotion = move_input(game.position, move)
+        else:
+            text, _, promotion = text.partition("=")
+            if not promotion and len(text) == 7:
+                text, promotion = text[:6], text[6]
+        move_result = apply_move(game, text, promotion or None)
+        if move_result.error is not None:
+            result.update(legal=False, ply=ply, move=moves[ply-1], error=move_result.error)
+            break
+        check = move_result.check
+    else:
+        result["legal"] = True
+    result.update(plies=len(game.moves), check=check, status=game.status)
+    if game.status != PLAYING:
+        result["winner"] = game.winner
+    return result
+
+#Yields the replay tasks for an archive without reading more of the file than needed
+def read_tasks(lines, archive_format):
+    if archive_format == "pgn":
+        for game_id, tags, moves in read_pgn(lines):
+            yield game_id, "pgn", moves, tags
+    else:
+        for game_id, moves in read_move_lists(lines):
+            yield game_id, "moves", moves, {}
+
+#Replays every game from tasks and yields the results in archive order. With workers above one
+#the games go to a process pool chunk_size games at a time, with at most a few chunks per worker
+#waiting, so memory use doesn't grow with the size of the archive.
+def replay_archive(tasks, workers=1, chunk_size=64):
+    if workers <= 1:
+        for task in tasks:
+            yield replay_game(task)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        while True:
+            batch = list(itertools.islice(tasks, chunk_size*workers*4))
+            if not batch:
+                break
+            for result in pool.imap(replay_game, batch, chunk_size):
+                yield result
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay and check archived GregChess games")
+    parser.add_argument("archive", help="file of games, or - for standard input")
+    parser.add_argument("--format", choices=["moves", "pgn"],
+                        help="archive format (default: pgn for .pgn files, otherwise moves)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=64, help="games sent to a worker at a time")
+    parser.add_argument("--output", help="file to write results to (default: standard output)")
+    args = parser.parse_args()
+
+    archive_format = args.format or ("pgn" if args.archive.lower().endswith(".pgn") else "moves")
+    archive = sys.stdin if args.archive == "-" else open(args.archive)
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in replay_archive(read_tasks(archive, archive_format), args.workers, args.chunk_size):
+            output.write(json.dumps(result) + "\n")
+    finally:
+        if archive is not sys.stdin:
+            archive.close()
+        if output is not sys.stdout:
+            output.close()
+
+if __name__ == "__main__":
+    main()
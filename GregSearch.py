@@ -0,0 +1,597 @@
+#GregChess search
+#Computer player for GregChess, built on the move generator in GregChess.py
+
+""" Negamax alpha-beta search with iterative deepening under a time or node budget.
+Moves are tried in the order: transposition table move, captures (most valuable victim first,
+then least valuable attacker), killer moves, then quiet moves by history score. A quiescence
+search keeps following captures past the last full move so positions are only scored when quiet.
+
+With workers=N the moves from the root position are shared out across N processes, one depth at
+a time: the best move so far is searched first, then the others only have to show they beat it.
+
+Usage:
+python GregSearch.py --fen "<FEN>" --time 5000      Analyse a position for five seconds
+python GregSearch.py --time 5000 --workers 8        Analyse using 8 worker processes
+python GregSearch.py --depth 5 --scaling 8          Report the speedup from 1, 2, 4 and 8 workers
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from GregChess import EMPTY, WHITE, CASTLE, EN_PASSANT, PROMOTE_KNIGHT, promotion_pieces, Game, from_fen, pack_position, unpack_position, \
+                      make_move, unmake_move, generate_pseudo_moves, generate_legal_moves, check_for_check, \
+                      move_destination, move_start, move_flag, move_input, move_text
+
+MATE = 100000       #Score for giving mate, less the number of moves it takes
+INFINITY = 1000000
+MAX_PLY = 128
+
+#Piece values in centipawns. Knights are K and kings are G in this game.
+piece_values = {"P": 100, "K": 320, "B": 330, "R": 500, "Q": 900, "G": 0}
+
+#Bonuses for white pieces on each square, a8 first, as on the board. Black uses the mirror image.
+piece_square_tables = {
+    "P": [  0,  0,  0,  0,  0,  0,  0,  0,
+           50, 50, 50, 50, 50, 50, 50, 50,
+           10, 10, 20, 30, 30, 20, 10, 10,
+            5,  5, 10, 25, 25, 10,  5,  5,
+            0,  0,  0, 20, 20,  0,  0,  0,
+            5, -5,-10,  0,  0,-10, -5,  5,
+            5, 10, 10,-20,-20, 10, 10,  5,
+            0,  0,  0,  0,  0,  0,  0,  0],
+    "K": [-50,-40,-30,-30,-30,-30,-40,-50,
+          -40,-20,  0,  0,  0,  0,-20,-40,
+          -30,  0, 10, 15, 15, 10,  0,-30,
+          -30,  5, 15, 20, 20, 15,  5,-30,
+          -30,  0, 15, 20, 20, 15,  0,-30,
+          -30,  5, 10, 15, 15, 10,  5,-30,
+          -40,-20,  0,  5,  5,  0,-20,-40,
+          -50,-40,-30,-30,-30,-30,-40,-50],
+    "B": [-20,-10,-10,-10,-10,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5, 10, 10,  5,  0,-10,
+          -10,  5,  5, 10, 10,  5,  5,-10,
+          -10,  0, 10, 10, 10, 10,  0,-10,
+          -10, 10, 10, 10, 10, 10, 10,-10,
+          -10,  5,  0,  0,  0,  0,  5,-10,
+          -20,-10,-10,-10,-10,-10,-10,-20],
+    "R": [  0,  0,  0,  0,  0,  0,  0,  0,
+            5, 10, 10, 10, 10, 10, 10,  5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+           -5,  0,  0,  0,  0,  0,  0, -5,
+            0,  0,  0,  5,  5,  0,  0,  0],
+    "Q": [-20,-10,-10, -5, -5,-10,-10,-20,
+          -10,  0,  0,  0,  0,  0,  0,-10,
+          -10,  0,  5,  5,  5,  5,  0,-10,
+           -5,  0,  5,  5,  5,  5,  0, -5,
+            0,  0,  5,  5,  5,  5,  0, -5,
+          -10,  5,  5,  5,  5,  5,  0,-10,
+          -10,  0,  5,  0,  0,  0,  0,-10,
+          -20,-10,-10, -5, -5,-10,-10,-20],
+    "G": [-30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -30,-40,-40,-50,-50,-40,-40,-30,
+          -20,-30,-30,-40,-40,-30,-30,-20,
+          -10,-20,-20,-20,-20,-20,-20,-10,
+           20, 20,  0,  0,  0,  0, 20, 20,
+           20, 30, 10,  0,  0, 10, 30, 20],
+}
+
+#Score of each piece letter on each square from white's side: value plus square bonus,
+#negative for black pieces. Square a8 is 0, so square ^ 56 flips the board top to bottom.
+piece_scores = {}
+for p in piece_values:
+    piece_scores[p] = [piece_values[p] + piece_square_tables[p][square] for square in range(64)]
+    piece_scores[p.lower()] = [-piece_values[p] - piece_square_tables[p][square ^ 56] for square in range(64)]
+
+#Scores a position from white's side
+def material_score(position):
+    score = 0
+    for square, piece in enumerate(position.squares):
+        if piece != EMPTY:
+            score += piece_scores[piece][square]
+    return score
+
+#Scores a position for the player to move
+def evaluate(position):
+    if position.turn == WHITE:
+        return material_score(position)
+    return -material_score(position)
+
+#How much a move, not yet made, changes material_score. Lets the search keep the score up to date
+#as it makes and unmakes moves instead of adding up the whole board at every position.
+def score_change(position, move):
+    squares = position.squares
+    start, end, flag = move_start(move), move_destination(move), move_flag(move)
+    piece = squares[start]
+    change = -piece_scores[piece][start]
+    if flag >= PROMOTE_KNIGHT:
+        new_piece = promotion_pieces[flag]
+        change += piece_scores[new_piece if piece == "P" else new_piece.lower()][end]
+    else:
+        change += piece_scores[piece][end]
+    if flag == EN_PASSANT:
+        captured_square = end+8 if piece == "P" else end-8
+        change -= piece_scores[squares[captured_square]][captured_square]
+    elif squares[end] != EMPTY:
+        change -= piece_scores[squares[end]][end]
+    elif flag == CASTLE:
+        rook_start, rook_end = (start+3, start+1) if end > start else (start-4, start-1)
+        rook = squares[rook_start]
+        change += piece_scores[rook][rook_end] - piece_scores[rook][rook_start]
+    return change
+
+#Bounds stored with transposition table scores
+EXACT, LOWER, UPPER = 0, 1, 2
+
+#Fixed-size table of search results keyed by Zobrist key. Each slot holds one entry:
+#(key, depth, score, bound, move, generation). A slot is overwritten unless it holds a different
+#position that was searched deeper during the current search.
+class TranspositionTable(object):
+    __slots__ = ("entries", "mask", "generation")
+
+    #size is rounded down to a power of two so a key can be turned into a slot with a mask
+    def __init__(self, size=1 << 16):
+        size = 1 << (size.bit_length() - 1)
+        self.entries = [None]*size
+        self.mask = size - 1
+        self.generation = 0
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[index] = (key, depth, score, bound, move, self.generation)
+
+#Mate scores are stored relative to the position they were found in, so a mate found
+#through a different move order still gives the right distance to mate.
+def score_to_table(score, ply):
+    if score > MATE - MAX_PLY:
+        return score + ply
+    if score < -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+def score_from_table(score, ply):
+    if score > MATE - MAX_PLY:
+        return score - ply
+    if score < -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+#Captures, en passant and promotions, the moves the quiescence search follows
+def is_noisy(position, move):
+    return position.squares[move_destination(move)] != EMPTY or move_flag(move) >= EN_PASSANT
+
+#Search results: the best move found, its score for the player to move in centipawns, the
+#deepest completed depth, nodes searched, time taken and the expected line of play.
+class SearchResult(object):
+    __slots__ = ("move", "score", "depth", "nodes", "time_ms", "pv")
+
+    def __init__(self):
+        self.move = None
+        self.score = 0
+        self.depth = 0
+        self.nodes = 0
+        self.time_ms = 0
+        self.pv = []
+
+#State for one search: the position being searched (moves are made and unmade on it) and its
+#material_score, the transposition table, killer moves per ply, history scores and the budget.
+class Searcher(object):
+    __slots__ = ("position", "score", "table", "killers", "history", "nodes", "deadline", "max_nodes",
+                 "stopped", "root_move")
+
+    def __init__(self, position, table, deadline=None, max_nodes=None):
+        self.position = position
+        self.score = material_score(position)
+        self.table = table
+        self.killers = [[0, 0] for ply in range(MAX_PLY)]
+        self.history = {p: [0]*64 for p in piece_scores}
+        self.nodes = 0
+        self.deadline = deadline
+        self.max_nodes = max_nodes
+        self.stopped = False
+        self.root_move = None
+
+    def check_limits(self):
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.stopped = True
+
+    #Sorts moves best first: table move, captures by MVV-LVA, promotions, killers, then history
+    def order_moves(self, moves, table_move, ply):
+        squares = self.position.squares
+        killers = self.killers[ply]
+        history = self.history
+
+        def move_score(m):
+            if m == table_move:
+                return 1000000
+            victim = squares[move_destination(m)]
+            attacker = squares[move_start(m)]
+            if victim != EMPTY:
+                return 100000 + 10*piece_values[victim.upper()] - piece_values[attacker.upper()]
+            if move_flag(m) == EN_PASSANT:
+                return 100000 + 9*piece_values["P"]
+            if move_flag(m) >= PROMOTE_KNIGHT:
+                return 90000 + move_flag(m)
+            if m == killers[0]:
+                return 80000
+            if m == killers[1]:
+                return 70000
+            return history[attacker][move_destination(m)]
+
+        return sorted(moves, key=move_score, reverse=True)
+
+    def negamax(self, depth, alpha, beta, ply):
+        position = self.position
+        #A position repeated inside the search, or a fifty-move draw, scores as a draw
+        if ply > 0 and (position.repetitions[position.key] > 1 or position.halfmove_clock >= 100):
+            return 0
+        if depth <= 0 or ply >= MAX_PLY - 1:
+            return self.quiescence(alpha, beta, ply)
+
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+        if self.stopped:
+            return 0
+
+        original_alpha = alpha
+        table_move = 0
+        entry = self.table.probe(position.key)
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth and ply > 0:
+                score = score_from_table(entry[2], ply)
+                if entry[3] == EXACT:
+                    return score
+                if entry[3] == LOWER and score >= beta:
+                    return score
+                if entry[3] == UPPER and score <= alpha:
+                    return score
+
+        color = position.turn
+        best_score = -INFINITY
+        best = 0
+        legal_moves = 0
+        for m in self.order_moves(generate_pseudo_moves(position, color), table_move, ply):
+            change = score_change(position, m)
+            captured = make_move(position, m)
+            if check_for_check(color, position):
+                unmake_move(position)
+                continue
+            legal_moves += 1
+            self.score += change
+            score = -self.negamax(depth-1, -beta, -alpha, ply+1)
+            self.score -= change
+            unmake_move(position)
+            if self.stopped:
+                return 0
+
+            if score > best_score:
+                best_score = score
+                best = m
+                if ply == 0:
+                    self.root_move = m
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                #Remember quiet moves that cause a cutoff to try them early elsewhere
+                if captured == EMPTY:
+                    killers = self.killers[ply]
+                    if killers[0] != m:
+                        killers[1] = killers[0]
+                        killers[0] = m
+                    self.history[position.squares[move_start(m)]][move_destination(m)] += depth*depth
+                break
+
+        if legal_moves == 0:
+            if check_for_check(color, position):
+                return -MATE + ply
+            return 0
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(position.key, depth, score_to_table(best_score, ply), bound, best)
+        return best_score
+
+    #Searches only captures and promotions until the position is quiet. The player to move
+    #can always stand pat and take the static score instead of capturing.
+    def quiescence(self, alpha, beta, ply):
+        position = self.position
+        self.nodes += 1
+        if self.nodes & 1023 == 0:
+            self.check_limits()
+        if self.stopped:
+            return 0
+
+        stand_pat = self.score if position.turn == WHITE else -self.score
+        if stand_pat >= beta or ply >= MAX_PLY - 1:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        color = position.turn
+        moves = [m for m in generate_pseudo_moves(position, color) if is_noisy(position, m)]
+        for m in self.order_moves(moves, 0, ply):
+            change = score_change(position, m)
+            make_move(position, m)
+            if check_for_check(color, position):
+                unmake_move(position)
+                continue
+            self.score += change
+            score = -self.quiescence(-beta, -alpha, ply+1)
+            self.score -= change
+            unmake_move(position)
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+#Follows the best moves stored in the table from the position to give the expected line of play
+def principal_variation(position, table, depth):
+    pv = []
+    while len(pv) < depth:
+        entry = table.probe(position.key)
+        if entry is None or entry[4] not in generate_legal_moves(position, position.turn):
+            break
+        pv.append(entry[4])
+        make_move(position, entry[4])
+    for m in pv:
+        unmake_move(position)
+    return pv
+
+#Searches a position with iterative deepening until the time (milliseconds), node or depth
+#budget runs out, and returns a SearchResult for the deepest completed search.
+#info, if given, is called with the SearchResult after each completed depth.
+#With workers above one the search is split across processes by parallel_search, using pool if given.
+def search(position, time_ms=None, max_depth=MAX_PLY-1, max_nodes=None, table=None, info=None, workers=1,
+           pool=None):
+    if workers > 1:
+        return parallel_search(position, time_ms, max_depth, workers, info, pool, max_nodes=max_nodes, table=table)
+    start = time.perf_counter()
+    deadline = start + time_ms/1000.0 if time_ms is not None else None
+    if table is None:
+        table = TranspositionTable()
+    table.generation += 1
+    searcher = Searcher(position, table, deadline, max_nodes)
+    result = SearchResult()
+    legal_moves = generate_legal_moves(position, position.turn)
+    if not legal_moves:
+        return result
+    result.move = legal_moves[0]
+
+    for depth in range(1, max_depth+1):
+        searcher.root_move = None
+        score = searcher.negamax(depth, -INFINITY, INFINITY, 0)
+        if searcher.stopped:
+            #Keep a move from an unfinished search only if nothing deeper was finished
+            if depth == 1 and searcher.root_move is not None:
+                result.move = searcher.root_move
+            break
+        result.move = searcher.root_move
+        result.score = score
+        result.depth = depth
+        result.nodes = searcher.nodes
+        result.time_ms = (time.perf_counter() - start)*1000
+        result.pv = principal_variation(position, table, depth)
+        if info is not None:
+            info(result)
+        if abs(score) > MATE - MAX_PLY:
+            break   #A forced mate was found, searching deeper won't change the move
+
+    result.nodes = searcher.nodes
+    result.time_ms = (time.perf_counter() - start)*1000
+    return result
+
+#Each worker process keeps one transposition table for all the tasks it is given
+worker_table = None
+
+def init_worker(table_size):
+    global worker_table
+    worker_table = TranspositionTable(table_size)
+
+#The Zobrist keys of the positions since the last capture or pawn move, the only ones that can repeat
+def recent_keys(position):
+    if position.halfmove_clock == 0:
+        return []
+    return [entry[5] for entry in position.history[-position.halfmove_clock:]]
+
+#Starts a pool of worker processes for parallel_search. Pass it to search, parallel_search or
+#best_move to reuse the same processes (and their tables) for every move instead of starting new ones.
+def start_pool(workers, table_size=1 << 16):
+    return multiprocessing.Pool(workers, initializer=init_worker, initargs=(table_size,))
+
+#Pool worker: searches the position after one root move to the given depth inside the window
+#(alpha, beta) for the player at the root. The position arrives packed by pack_position with its
+#recent keys, so a task is a few hundred bytes at most and repetitions are still scored as draws.
+#The deadline is a time.time() value. Returns the score, whether the search was stopped, the nodes
+#searched and the expected line of play after the move.
+def search_root_move(task):
+    packed, keys, move, depth, alpha, beta, deadline, max_nodes = task
+    position = unpack_position(packed)
+    for key in keys:
+        position.repetitions[key] = position.repetitions.get(key, 0) + 1
+    make_move(position, move)
+    if deadline is not None:
+        deadline = time.perf_counter() + deadline - time.time()
+    worker_table.generation += 1
+    searcher = Searcher(position, worker_table, deadline, max_nodes)
+    score = -searcher.negamax(depth-1, -beta, -alpha, 1)
+    return move, score, searcher.stopped, searcher.nodes, principal_variation(position, worker_table, depth-1)
+
+#Iterative deepening with the root moves split across a pool of worker processes. At each depth
+#the best move from the last depth is searched first, here, with a full window and the given
+#table. The other moves then go to the workers with a null window around its score, which only
+#asks whether they are better; the few that are get searched again with an open window to find
+#their score. Stops when the time, node or depth budget runs out. Every search at a depth is limited
+#to the nodes left when the depth started, so running side by side they can go over the budget.
+#pool, if given, is reused instead of starting new processes.
+def parallel_search(position, time_ms=None, max_depth=MAX_PLY-1, workers=2, info=None, pool=None,
+                    table_size=1 << 16, max_nodes=None, table=None):
+    start = time.perf_counter()
+    deadline = time.time() + time_ms/1000.0 if time_ms is not None else None
+    result = SearchResult()
+    root_moves = generate_legal_moves(position, position.turn)
+    if not root_moves:
+        return result
+    result.move = root_moves[0]
+    if table is None:
+        table = TranspositionTable(table_size)
+
+    packed = pack_position(position)
+    keys = recent_keys(position)
+    own_pool = pool is None
+    if own_pool:
+        pool = start_pool(workers, table_size)
+    try:
+        for depth in range(1, max_depth+1):
+            remaining = max_nodes - result.nodes if max_nodes is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            #The first move, searched here
+            table.generation += 1
+            local_deadline = start + time_ms/1000.0 if time_ms is not None else None
+            first = root_moves[0]
+            make_move(position, first)
+            searcher = Searcher(position, table, local_deadline, remaining)
+            best_score = -searcher.negamax(depth-1, -INFINITY, INFINITY, 1)
+            pv = [first] + principal_variation(position, table, depth-1)
+            unmake_move(position)
+            result.nodes += searcher.nodes
+            if searcher.stopped:
+                break
+            scores = {first: best_score}
+
+            #The rest, by the workers, with a null window that only asks whether they beat the first move
+            alpha = best_score
+            tasks = [(packed, keys, m, depth, alpha, alpha+1, deadline, remaining) for m in root_moves[1:]]
+            stopped = False
+            better = []
+            for move, score, move_stopped, nodes, line in pool.imap_unordered(search_root_move, tasks):
+                result.nodes += nodes
+                if move_stopped:
+                    stopped = True
+                elif score > alpha:
+                    better.append(move)
+                else:
+                    scores[move] = score
+            #The few that do are searched again with an open window to find their score
+            if better and not stopped:
+                tasks = [(packed, keys, m, depth, alpha, INFINITY, deadline, remaining) for m in better]
+                for move, score, move_stopped, nodes, line in pool.imap_unordered(search_root_move, tasks):
+                    result.nodes += nodes
+                    if move_stopped:
+                        stopped = True
+                        continue
+                    scores[move] = score
+                    if score > best_score:
+                        best_score, pv = score, [move] + line
+            if max_nodes is not None and result.nodes >= max_nodes:
+                stopped = True
+            if stopped:
+                break
+            root_moves.sort(key=scores.get, reverse=True)
+            root_moves.remove(pv[0])
+            root_moves.insert(0, pv[0])
+            result.move = pv[0]
+            result.score = best_score
+            result.depth = depth
+            result.time_ms = (time.perf_counter() - start)*1000
+            result.pv = pv
+            if info is not None:
+                info(result)
+            if abs(result.score) > MATE - MAX_PLY:
+                break
+    finally:
+        if own_pool:
+            pool.close()
+    result.time_ms = (time.perf_counter() - start)*1000
+    return result
+
+#Searches a position to a fixed depth with 1, 2, 4... up to max_workers processes and prints
+#the time and speedup of each over the single-process search. Each pool is started before its
+#search is timed, so process startup isn't counted.
+def scaling_report(position, depth, max_workers):
+    result = search(position, max_depth=depth)
+    base = result.time_ms
+    print("workers  1  nodes {:>9}  time {:>8.0f}ms  speedup 1.00  best {}".format(
+          result.nodes, base, move_text(result.move)))
+    workers = 2
+    while workers <= max_workers:
+        with start_pool(workers) as pool:
+            result = parallel_search(position, max_depth=depth, workers=workers, pool=pool)
+        print("workers {:>2}  nodes {:>9}  time {:>8.0f}ms  speedup {:.2f}  best {}".format(
+              workers, result.nodes, result.time_ms, base/result.time_ms, move_text(result.move)))
+        if workers < max_workers:
+            workers = min(workers*2, max_workers)
+        else:
+            break
+
+#Picks a move for the player to move in the game within time_ms milliseconds. A move from the
+#opening book or endgame table (GregBook), if given and the position is in them, is played
+#without searching. With workers above one, pass a pool from start_pool to keep the same worker
+#processes from move to move. Returns the move in the "Pa2 a4" format and the promotion piece letter
+#(or None), ready to pass to apply_move, or None if the player has no moves.
+def best_move(game, time_ms=1000, table=None, workers=1, book=None, endgames=None, pool=None):
+    move = None
+    if book is not None:
+        move = book.choose(game.position)
+    if move is None and endgames is not None:
+        move = endgames.best_move(game.position)
+    if move is None:
+        move = search(game.position, time_ms, table=table, workers=workers, pool=pool).move
+    if move is None:
+        return None
+    return move_input(game.position, move)
+
+#Prints one line of analysis for a completed search depth
+def print_info(result):
+    print("depth {:>2}  score {:>7}  nodes {:>9}  time {:>7.0f}ms  nps {:>7.0f}  pv {}".format(
+          result.depth, result.score, result.nodes, result.time_ms,
+          result.nodes/(result.time_ms/1000.0) if result.time_ms else 0, " ".join(move_text(m) for m in result.pv)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse a position with the GregChess search")
+    parser.add_argument("--fen", default="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
+    parser.add_argument("--time", type=int, default=5000, help="time to search in milliseconds")
+    parser.add_argument("--depth", type=int, default=MAX_PLY-1)
+    parser.add_argument("--nodes", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--scaling", type=int, metavar="N",
+                        help="report the speedup with up to N workers searching to --depth")
+    args = parser.parse_args()
+
+    game = Game(from_fen(args.fen))
+    if args.scaling:
+        scaling_report(game.position, args.depth, args.scaling)
+        return
+    result = search(game.position, args.time, args.depth, args.nodes, info=print_info, workers=args.workers)
+    if result.move is None:
+        print("No legal moves")
+        return
+    print("Best move: {}".format(move_text(result.move)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+#GregChess server
+#Hosts any number of games from one process over a local TCP socket.
+
+""" Players connect over TCP and are paired into games in the order they connect: the first of
+each pair plays white. Everything is sent as lines of text.
+
+Client to server:
+  Pa2 a4            a move, in the same format as the terminal game
+  Pe7 e8=Q          a move that promotes a pawn
+  moves             ask for the moves made so far
+  captured          ask for the captured pieces
+  resign            concede the game
+  quit              leave (resigns a game still being played)
+
+Server to client:
+  waiting                     no opponent yet
+  start <game> <color>        paired into game number <game>, playing <color>
+  move <move>[ takes <piece>][ check]
+                              a move was made in your game (by either player)
+  over <winner|draw> <status> the game has ended
+  board <FEN>                 the position, sent at the start and after every move; always the
+                              last line of an update
+  moves Pe2 e4,pe7 e5,...     the moves made so far
+  captured <JSON>             the captured pieces of each color
+  error <message>             the last line sent couldn't be used
+
+Usage:
+python GregServer.py --port 8014
+"""
+
+import argparse
+import asyncio
+import json
+
+from GregChess import Game, WHITE, BLACK, PLAYING, GAME_OVER, error_messages, apply_move, resign, to_fen
+
+#One player's connection. match is None until the player is paired with an opponent.
+class Seat(object):
+    __slots__ = ("writer", "color", "match")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.color = None
+        self.match = None
+
+    def send(self, line):
+        self.writer.write((line + "\n").encode())
+
+#A game being played on the server and the seats of its two players
+class Match(object):
+    __slots__ = ("id", "game", "seats")
+
+    def __init__(self, match_id, white, black):
+        self.id = match_id
+        self.game = Game()
+        self.seats = [white, black]
+
+    def broadcast(self, line):
+        for seat in self.seats:
+            seat.send(line)
+
+#Pairs connections into games and routes each line a player sends to their game.
+#Everything runs on the event loop's thread, so a game is only ever changed by one command at a time.
+class GameServer(object):
+
+    def __init__(self):
+        self.matches = {}
+        self.waiting = None
+        self.next_id = 1
+        self.moves_made = 0
+
+    #asyncio.start_server callback: serves one connection until the player quits or disconnects
+    async def handle(self, reader, writer):
+        seat = Seat(writer)
+        self.join(seat)
+        try:
+            await self.drain(seat)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not self.command(seat, line.decode(errors="replace").strip()):
+                    break
+                await self.drain(seat)
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(seat)
+            writer.close()
+
+    #Waits until what was written to the player, and to their opponent, is down to the transport's
+    #limit, so a client that stops reading holds up its own game rather than filling the server's
+    #memory. Only the player's own lost connection is raised; the opponent's handler sees theirs.
+    async def drain(self, seat):
+        seats = seat.match.seats if seat.match is not None else [seat]
+        for player in seats:
+            try:
+                await player.writer.drain()
+            except ConnectionError:
+                if player is seat:
+                    raise
+
+    #Seats a new player, starting a game if someone is waiting for an opponent
+    def join(self, seat):
+        if self.waiting is None:
+            self.waiting = seat
+            seat.send("waiting")
+            return
+        match = Match(self.next_id, self.waiting, seat)
+        self.next_id += 1
+        self.waiting = None
+        self.matches[match.id] = match
+        for player, color in zip(match.seats, (WHITE, BLACK)):
+            player.color = color
+            player.match = match
+            player.send("start {} {}".format(match.id, color))
+        match.broadcast("board " + to_fen(match.game.position))
+
+    #A player has gone: a game they were playing is resigned
+    def leave(self, seat):
+        if self.waiting is seat:
+            self.waiting = None
+        match = seat.match
+        if match is not None and match.game.status == PLAYING:
+            resign(match.game, seat.color)
+            self.finish(match)
+
+    #Tells both players how the game ended and stops tracking it
+    def finish(self, match):
+        game = match.game
+        match.broadcast("over {} {}".format(game.winner or "draw", game.status))
+        match.broadcast("board " + to_fen(game.position))
+        self.matches.pop(match.id, None)
+
+    #Handles one line from a player. Returns False when the player wants to leave.
+    def command(self, seat, text):
+        if text == "quit":
+            return False
+        match = seat.match
+        if match is None:
+            seat.send("error Waiting for an opponent.")
+            return True
+        game = match.game
+        if text == "moves":
+            seat.send("moves " + ",".join(piece + " " + destination for piece, destination in game.move_list))
+        elif text == "captured":
+            seat.send("captured " + json.dumps(game.captured_pieces))
+        elif game.status != PLAYING:
+            seat.send("error " + error_messages[GAME_OVER])
+        elif text == "resign":
+            resign(game, seat.color)
+            self.finish(match)
+        elif seat.color != game.player:
+            seat.send("error It's not your turn.")
+        else:
+            self.move(seat, match, text)
+        return True
+
+    #Makes a move in a player's game and pushes the update to both players
+    def move(self, seat, match, text):
+        game = match.game
+        text, _, promotion = text.partition("=")
+        result = apply_move(game, text, promotion or None)
+        if result.error is not None:
+            seat.send("error " + error_messages[result.error].format(player=seat.color.split("(")[0]))
+            return
+        self.moves_made += 1
+        update = "move " + text + ("=" + promotion if promotion else "")
+        if result.captured is not None:
+            update += " takes " + result.captured
+        if result.check:
+            update += " check"
+        match.broadcast(update)
+        if game.status != PLAYING:
+            self.finish(match)
+        else:
+            match.broadcast("board " + to_fen(game.position))
+
+#Starts serving games on host and port. Returns the asyncio server; port 0 picks a free port.
+async def start_server(host="127.0.0.1", port=8014, server=None):
+    server = server or GameServer()
+    return await asyncio.start_server(server.handle, host, port)
+
+async def serve(host, port):
+    tcp = await start_server(host, port)
+    print("Serving games on {}".format(", ".join(str(s.getsockname()) for s in tcp.sockets)))
+    async with tcp:
+        await tcp.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Host GregChess games over TCP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8014)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()